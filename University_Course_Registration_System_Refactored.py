@@ -2,10 +2,34 @@
 Refactored University Course Registration System
 Improved design with reduced complexity, coupling, and better cohesion
 """
+import atexit
+import csv
+import gc
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional
+from itertools import islice
+from types import MappingProxyType
+from typing import (
+    Iterable, Iterator, List, Dict, Mapping, MutableMapping, Optional, Sequence, TextIO, Tuple,
+    Union, ValuesView
+)
 from enum import Enum
 
+try:
+    import numpy as np
+except ImportError:  # CohortScores falls back to pure Python
+    np = None
+
 
 class Grade(Enum):
     """Enum for grade values to reduce magic strings"""
@@ -23,6 +47,169 @@ class PerformanceLevel(Enum):
     NORMAL = ""
 
 
+class EventSink(ABC):
+    """Receives one dict per mutation (student added, course registered, grade submitted, ...)"""
+    enabled = True  # False lets callers skip building events nobody records
+
+    @abstractmethod
+    def emit(self, event: Dict) -> None:
+        """Record one event"""
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class NullEventSink(EventSink):
+    """Drops every event; the default, so mutations are silent"""
+    enabled = False
+
+    def emit(self, event: Dict) -> None:
+        pass
+
+
+class RingBufferSink(EventSink):
+    """Keeps the most recent `capacity` events in memory"""
+
+    def __init__(self, capacity: int = 10000):
+        self._events = deque(maxlen=capacity)
+
+    def emit(self, event: Dict) -> None:
+        self._events.append(event)
+
+    def events(self) -> List[Dict]:
+        return list(self._events)
+
+
+class PrintEventSink(EventSink):
+    """Prints each event as the console messages these operations used to print"""
+    MESSAGES = {
+        'student_added': "Added student {name}",
+        'student_rejected': "Student ID {student_id} already exists",
+        'course_registered': "{name} registered for {title}",
+        'course_already_registered': "{name} already registered for {title}",
+        'student_enrolled': "{name} added to {title}",
+        'lecturer_assigned': "{name} assigned to {title}",
+        'grade_submitted': "Assigned grade {grade} to {name} for {code}",
+    }
+
+    def emit(self, event: Dict) -> None:
+        print(self.MESSAGES[event['event']].format(**event))
+
+
+class AuditLogSink(EventSink):
+    """Appends events as JSON lines to `path`, written in batches by a background thread
+    
+    emit() only queues the event. flush() waits until everything emitted so
+    far is written; close() also stops the thread, and runs at interpreter
+    exit if not called before. Fields JSON can't encode are written as str();
+    events that still fail and write errors are kept in `error` rather than
+    raised in the thread.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1000):
+        self._file = open(path, 'a', encoding='utf-8')
+        self._queue = queue.SimpleQueue()
+        self._batch_size = batch_size
+        self._encode = json.JSONEncoder(separators=(',', ':'), default=str).encode
+        self.error: Optional[Exception] = None
+        self._stopped = False
+        self._lock = threading.Lock()  # Orders flush markers against the thread stopping
+        self._thread = threading.Thread(target=self._run, name='audit-log', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def emit(self, event: Dict) -> None:
+        self._queue.put(event)
+
+    def _write(self, lines: List[str]) -> None:
+        try:
+            self._file.write(''.join(lines))
+            self._file.flush()
+        except Exception as e:
+            self.error = e
+        lines.clear()
+
+    def _run(self) -> None:
+        try:
+            self._process()
+        finally:
+            with self._lock:
+                self._stopped = True
+            # Release flush() calls whose markers were queued before the thread stopped
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _process(self) -> None:
+        lines = []
+        while True:
+            batch = [self._queue.get()]  # Wait for work, then take what is queued
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if isinstance(item, dict):
+                    try:
+                        lines.append(self._encode(item) + '\n')
+                    except Exception as e:  # e.g. a circular reference; the event is dropped
+                        self.error = e
+                    continue
+                self._write(lines)  # A flush marker (threading.Event) or None to stop
+                if item is None:
+                    return
+                item.set()
+            self._write(lines)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._stopped:
+                return
+            done = threading.Event()
+            self._queue.put(done)
+        done.wait()
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+        with self._lock:
+            if not self._stopped:
+                self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+
+_event_sink: EventSink = NullEventSink()
+
+
+def set_event_sink(sink: Optional[EventSink]) -> EventSink:
+    """Send mutation events to `sink` (None to drop them); returns the previous sink"""
+    global _event_sink
+    previous = _event_sink
+    _event_sink = sink if sink is not None else NullEventSink()
+    return previous
+
+
+def get_event_sink() -> EventSink:
+    return _event_sink
+
+
+def emit_event(event: str, **fields) -> None:
+    """Record a mutation with the configured sink, stamped with the time"""
+    sink = _event_sink
+    if sink.enabled:
+        fields['event'] = event
+        fields['time'] = time.time()
+        sink.emit(fields)
+
+
 class Person:
     """Base class for all persons in the system"""
     
@@ -86,22 +273,169 @@ class GradeCalculator:
         return round(total_points / len(grades), 2)
 
 
+class AttendanceRecord:
+    """One course's attendance, packed one bit per session (session 0 is the lowest bit)"""
+
+    __slots__ = ('_bits', '_sessions')
+
+    def __init__(self, records: Iterable[bool] = ()):
+        self._bits = bytearray()
+        self._sessions = 0
+        self.extend(records)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, sessions: int) -> 'AttendanceRecord':
+        """A record from to_bytes() output and its session count"""
+        record = cls()
+        record._bits = bytearray(data)
+        record._sessions = sessions
+        return record
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._bits)
+
+    def append(self, attended: bool) -> None:
+        """Record the next session"""
+        offset = self._sessions & 7
+        if offset == 0:
+            self._bits.append(0)
+        if attended:
+            self._bits[-1] |= 1 << offset
+        self._sessions += 1
+
+    def extend(self, records: Iterable[bool]) -> None:
+        for attended in records:
+            self.append(attended)
+
+    def __len__(self) -> int:
+        return self._sessions
+
+    def __getitem__(self, index: int) -> bool:
+        if index < 0:
+            index += self._sessions
+        if not 0 <= index < self._sessions:
+            raise IndexError("session index out of range")
+        return bool(self._bits[index >> 3] >> (index & 7) & 1)
+
+    def __iter__(self) -> Iterator[bool]:
+        for index in range(self._sessions):
+            yield bool(self._bits[index >> 3] >> (index & 7) & 1)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, AttendanceRecord):
+            return NotImplemented
+        return self._sessions == other._sessions and self._bits == other._bits
+
+    def __repr__(self) -> str:
+        return f"AttendanceRecord({list(self)!r})"
+
+    def attended(self, start: int = 0, stop: Optional[int] = None) -> int:
+        """Sessions attended in range(start, stop), counted by popcount"""
+        start, stop, _ = slice(start, stop).indices(self._sessions)
+        if start >= stop:
+            return 0
+        value = int.from_bytes(self._bits[start >> 3:(stop + 7) >> 3], 'little') >> (start & 7)
+        return (value & ((1 << (stop - start)) - 1)).bit_count()
+
+    def rate(self, start: int = 0, stop: Optional[int] = None) -> float:
+        """Percentage of sessions attended in range(start, stop); 0.0 for no sessions"""
+        start, stop, _ = slice(start, stop).indices(self._sessions)
+        if start >= stop:
+            return 0.0
+        return (self.attended(start, stop) / (stop - start)) * 100
+
+    def copy(self) -> 'AttendanceRecord':
+        return AttendanceRecord.from_bytes(self._bits, self._sessions)
+
+
+class AttendanceView:
+    """Read-only view of an AttendanceRecord, so changes go through its Student"""
+
+    __slots__ = ('_record',)
+
+    def __init__(self, record: AttendanceRecord):
+        self._record = record
+
+    def __len__(self) -> int:
+        return len(self._record)
+
+    def __getitem__(self, index: int) -> bool:
+        return self._record[index]
+
+    def __iter__(self) -> Iterator[bool]:
+        return iter(self._record)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, AttendanceView):
+            other = other._record
+        return self._record == other
+
+    def __repr__(self) -> str:
+        return repr(self._record)
+
+    def attended(self, start: int = 0, stop: Optional[int] = None) -> int:
+        return self._record.attended(start, stop)
+
+    def rate(self, start: int = 0, stop: Optional[int] = None) -> float:
+        return self._record.rate(start, stop)
+
+    def to_bytes(self) -> bytes:
+        return self._record.to_bytes()
+
+    def copy(self) -> AttendanceRecord:
+        return self._record.copy()
+
+
+class AttendanceMap(Mapping):
+    """Live read-only mapping of course code to AttendanceView"""
+
+    __slots__ = ('_records',)
+
+    def __init__(self, records: Mapping[str, AttendanceRecord]):
+        self._records = records
+
+    def __getitem__(self, course_code: str) -> AttendanceView:
+        return AttendanceView(self._records[course_code])
+
+    def __contains__(self, course_code) -> bool:
+        return course_code in self._records
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
 class AttendanceCalculator:
     """Separated responsibility for attendance calculations"""
     
     @staticmethod
-    def calculate_average_attendance(attendance: Dict[str, List[bool]]) -> float:
-        """Calculate average attendance rate across all courses"""
+    def calculate_average_attendance(
+            attendance: Mapping[str, Union[AttendanceRecord, AttendanceView, Sequence[bool]]]) -> float:
+        """Calculate average attendance rate across all courses
+        
+        Records may be AttendanceRecords (counted by popcount) or plain
+        sequences of booleans.
+        """
         if not attendance:
             return 0.0
         
+        packed = (AttendanceRecord, AttendanceView)
+        return AttendanceCalculator.average_of_counts(
+            (records.attended() if isinstance(records, packed) else sum(records), len(records))
+            for records in attendance.values())
+
+    @staticmethod
+    def average_of_counts(counts: Iterable[Tuple[int, int]]) -> float:
+        """Average attendance rate from (attended, sessions) per course"""
         total_rate = 0.0
-        for records in attendance.values():
-            if records:
-                attended = sum(1 for r in records if r)
-                total_rate += (attended / len(records)) * 100
-        
-        return total_rate / len(attendance)
+        courses = 0
+        for attended, sessions in counts:
+            if sessions:
+                total_rate += (attended / sessions) * 100
+            courses += 1
+        return total_rate / courses if courses else 0.0
 
 
 class PerformanceEvaluator:
@@ -117,51 +451,250 @@ class PerformanceEvaluator:
         return PerformanceLevel.NORMAL
 
 
+class CohortScores:
+    """GPA, average attendance and performance level for a whole cohort at once
+    
+    Takes flat columns: grade rows (student index, grade points, and how
+    many grades the points add up, one by default) and one row per course
+    attendance record (student index, sessions attended, sessions held).
+    Per-student average attendance may be given instead of attendance rows.
+    Results match the per-student calculators; NumPy scores the columns in a
+    few vectorized passes, and pure Python is the fallback. from_students
+    fills the columns from each Student's running totals.
+    """
+    LEVELS = (PerformanceLevel.NORMAL, PerformanceLevel.EXCELLENT, PerformanceLevel.WARNING)
+
+    def __init__(self, size: int, grade_student: Sequence[int], grade_points: Sequence[int],
+                 attendance_student: Sequence[int], attended: Sequence[int],
+                 sessions: Sequence[int], grade_counts: Optional[Sequence[int]] = None,
+                 average_attendance: Optional[Sequence[float]] = None):
+        self._size = size
+        self._grade_student = grade_student
+        self._grade_points = grade_points
+        self._grade_counts = grade_counts
+        self._average_attendance = average_attendance
+        self._attendance_student = attendance_student
+        self._attended = attended
+        self._sessions = sessions
+
+    @classmethod
+    def from_students(cls, students: Sequence['Student']) -> 'CohortScores':
+        """Columns for `students`, scored in the same order, from their running totals
+        
+        One grade row per student, and the attendance averages each Student
+        already keeps, so nothing is recounted per course.
+        """
+        grade_points, grade_counts, averages = array('i'), array('i'), array('d')
+        for student in students:
+            points, graded = student.grade_totals()
+            grade_points.append(points)
+            grade_counts.append(graded)
+            averages.append(student.average_attendance())
+        return cls(len(students), range(len(students)), grade_points, (), (), (), grade_counts,
+                   average_attendance=averages)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def gpa(self):
+        """Each student's GPA, rounded as GradeCalculator.calculate_gpa rounds it"""
+        if np is not None:
+            student = np.asarray(self._grade_student, dtype=np.intp)
+            totals = np.bincount(student, weights=np.asarray(self._grade_points, dtype=np.float64),
+                                 minlength=self._size)
+            weights = (None if self._grade_counts is None
+                       else np.asarray(self._grade_counts, dtype=np.float64))
+            counts = np.bincount(student, weights=weights, minlength=self._size)
+            gpa = np.divide(totals, counts, out=np.zeros(self._size), where=counts > 0)
+            # np.round scales by 100 first and can differ from round() at ties like 0.025;
+            # there are few distinct ratios, so round those the way Python does
+            ratios, positions = np.unique(gpa, return_inverse=True)
+            return np.array([round(ratio, 2) for ratio in ratios.tolist()])[positions]
+        totals, counts = [0] * self._size, [0] * self._size
+        grade_counts = self._grade_counts or [1] * len(self._grade_student)
+        for student, points, graded in zip(self._grade_student, self._grade_points, grade_counts):
+            totals[student] += points
+            counts[student] += graded
+        return [round(total / count, 2) if count else 0.0 for total, count in zip(totals, counts)]
+
+    def attendance(self):
+        """Each student's average attendance rate across their courses, in percent"""
+        if self._average_attendance is not None:
+            if np is not None:
+                return np.asarray(self._average_attendance, dtype=np.float64)
+            return list(self._average_attendance)
+        if np is not None:
+            student = np.asarray(self._attendance_student, dtype=np.intp)
+            attended = np.asarray(self._attended, dtype=np.float64)
+            sessions = np.asarray(self._sessions, dtype=np.float64)
+            # Same operations, in the same order, as AttendanceCalculator
+            rates = np.divide(attended, sessions, out=np.zeros(len(sessions)),
+                              where=sessions > 0) * 100
+            totals = np.bincount(student, weights=rates, minlength=self._size)
+            counts = np.bincount(student, minlength=self._size)
+            return np.divide(totals, counts, out=np.zeros(self._size), where=counts > 0)
+        totals, counts = [0.0] * self._size, [0] * self._size
+        for student, attended, sessions in zip(self._attendance_student, self._attended,
+                                               self._sessions):
+            if sessions:
+                totals[student] += (attended / sessions) * 100
+            counts[student] += 1
+        return [total / count if count else 0.0 for total, count in zip(totals, counts)]
+
+    def level_codes(self, gpa=None, attendance=None):
+        """Each student's performance level as an index into LEVELS"""
+        gpa = self.gpa() if gpa is None else gpa
+        attendance = self.attendance() if attendance is None else attendance
+        if np is not None:
+            gpa, attendance = np.asarray(gpa), np.asarray(attendance)
+            codes = np.zeros(self._size, dtype=np.int8)
+            codes[(gpa < 2.0) | (attendance < 60)] = 2
+            codes[(gpa >= 3.5) & (attendance >= 90)] = 1
+            return codes
+        return [self.LEVELS.index(PerformanceEvaluator.evaluate_performance(g, a))
+                for g, a in zip(gpa, attendance)]
+
+    def scores(self) -> Iterator[Tuple[float, float, PerformanceLevel]]:
+        """(GPA, attendance, performance level) per student, as Python values"""
+        gpa, attendance = self.gpa(), self.attendance()
+        codes = self.level_codes(gpa, attendance)
+        if np is not None:
+            gpa, attendance, codes = gpa.tolist(), attendance.tolist(), codes.tolist()
+        for g, a, code in zip(gpa, attendance, codes):
+            yield g, a, self.LEVELS[code]
+
+
 class Student(Person):
     """Student class with improved encapsulation and separation of concerns"""
     
     def __init__(self, student_id: str, name: str, email: str, phone: Optional[str] = None):
         super().__init__(student_id, name, email, phone)
         self._role = "Student"
-        self._courses: List['Course'] = []
+        self._courses: Dict[str, 'Course'] = {}  # Indexed by course code
         self._grades: Dict[str, str] = {}
-        self._attendance: Dict[str, List[bool]] = {}
+        self._attendance: Dict[str, AttendanceRecord] = {}
         self._last_login = datetime.now()
+        # Running totals behind gpa() and average_attendance(); None until (re)built
+        self._grade_totals: Optional[Tuple[int, int]] = (0, 0)  # Points, graded courses
+        self._attendance_counts: Optional[Dict[str, Tuple[int, int]]] = {}  # Attended, sessions
+        self._average_attendance: Optional[float] = 0.0
 
     @property
-    def courses(self) -> List['Course']:
-        return self._courses.copy()  # Return copy for encapsulation
+    def courses(self) -> ValuesView['Course']:
+        return self._courses.values()  # Live read-only view, no copy
 
     @property
-    def grades(self) -> Dict[str, str]:
-        return self._grades.copy()  # Return copy for encapsulation
+    def grades(self) -> Mapping[str, str]:
+        return MappingProxyType(self._grades)  # Read-only view, no copy
+
+    @property
+    def attendance(self) -> Mapping[str, AttendanceView]:
+        return AttendanceMap(self._attendance)  # Records can't be changed behind the totals
+
+    def use_storage(self, courses: MutableMapping[str, 'Course'], grades: MutableMapping[str, str],
+                    attendance: MutableMapping[str, AttendanceRecord]) -> None:
+        """Move this student's records into storage-backed mappings (see registration_storage)"""
+        courses.update(self._courses)
+        grades.update(self._grades)
+        attendance.update(self._attendance)
+        self._courses, self._grades, self._attendance = courses, grades, attendance
+        # The mappings may hold stored records; totals are rebuilt when next needed
+        self._grade_totals = self._attendance_counts = self._average_attendance = None
 
     def is_registered_for(self, course_code: str) -> bool:
         """Check if student is registered for a course"""
-        return any(course.code == course_code for course in self._courses)
+        return course_code in self._courses
+
+    def add_course(self, course: 'Course') -> bool:
+        """Record a course registration without output; False if already registered"""
+        if course.code in self._courses:
+            return False
+        self._courses[course.code] = course
+        return True
 
     def register_course(self, course: 'Course') -> bool:
         """Register for a course if not already registered"""
-        if not self.is_registered_for(course.code):
-            self._courses.append(course)
-            print(f"{self._name} registered for {course.title}")
+        if self.add_course(course):
+            emit_event('course_registered', student_id=self._person_id, name=self._name,
+                       code=course.code, title=course.title)
             return True
         else:
-            print(f"{self._name} already registered for {course.title}")
+            emit_event('course_already_registered', student_id=self._person_id, name=self._name,
+                       code=course.code, title=course.title)
             return False
 
     def add_grade(self, course_code: str, grade: str) -> None:
         """Add a grade for a course (encapsulated)"""
+        if self._grade_totals is not None:
+            points, graded = self._grade_totals
+            previous = self._grades.get(course_code)
+            if previous is None:
+                graded += 1
+            else:
+                points -= GradeCalculator.grade_to_points(previous)
+            self._grade_totals = (points + GradeCalculator.grade_to_points(grade), graded)
         self._grades[course_code] = grade
 
-    def add_attendance(self, course_code: str, records: List[bool]) -> None:
-        """Add attendance records for a course (encapsulated)"""
+    def add_attendance(self, course_code: str, records: Iterable[bool]) -> None:
+        """Add attendance records for a course (encapsulated); records are copied"""
+        if isinstance(records, (AttendanceRecord, AttendanceView)):
+            records = records.copy()
+        else:
+            records = AttendanceRecord(records)
         self._attendance[course_code] = records
+        if self._attendance_counts is not None:
+            self._attendance_counts[course_code] = (records.attended(), len(records))
+        self._average_attendance = None
+
+    def add_session(self, course_code: str, attended: bool) -> None:
+        """Append one session to a course's attendance"""
+        records = self._attendance.get(course_code)
+        if records is None:
+            records = AttendanceRecord()
+        records.append(attended)
+        self._attendance[course_code] = records  # Stored again so storage backends save it
+        if self._attendance_counts is not None:
+            present, sessions = self._attendance_counts.get(course_code, (0, 0))
+            self._attendance_counts[course_code] = (present + bool(attended), sessions + 1)
+        self._average_attendance = None
+
+    def grade_totals(self) -> Tuple[int, int]:
+        """Running (grade points, graded courses)"""
+        if self._grade_totals is None:
+            self._grade_totals = (sum(GradeCalculator.grade_to_points(grade)
+                                      for grade in self._grades.values()), len(self._grades))
+        return self._grade_totals
+
+    def attendance_counts(self) -> ValuesView[Tuple[int, int]]:
+        """Running (sessions attended, sessions held) per course, in record order"""
+        if self._attendance_counts is None:
+            self._attendance_counts = {code: (records.attended(), len(records))
+                                       for code, records in self._attendance.items()}
+        return self._attendance_counts.values()
+
+    def gpa(self) -> float:
+        """GPA from running totals; equal to GradeCalculator.calculate_gpa(grades)"""
+        points, graded = self.grade_totals()
+        return round(points / graded, 2) if graded else 0.0
+
+    def average_attendance(self) -> float:
+        """Cached average attendance; equal to AttendanceCalculator.calculate_average_attendance"""
+        if self._average_attendance is None:
+            # Same courses in the same order as the records, so the same float result
+            self._average_attendance = AttendanceCalculator.average_of_counts(
+                self.attendance_counts())
+        return self._average_attendance
+
+    def verify_aggregates(self) -> bool:
+        """Whether the running totals match a full recompute from the records"""
+        return (self.gpa() == GradeCalculator.calculate_gpa(self._grades)
+                and self.average_attendance()
+                == AttendanceCalculator.calculate_average_attendance(self._attendance))
 
     def calculate_performance(self) -> float:
         """Calculate and display student performance"""
-        gpa = GradeCalculator.calculate_gpa(self._grades)
-        avg_attendance = AttendanceCalculator.calculate_average_attendance(self._attendance)
+        gpa = self.gpa()
+        avg_attendance = self.average_attendance()
         
         print(f"GPA: {gpa}, Attendance: {avg_attendance:.1f}%")
         
@@ -180,7 +713,7 @@ class Course:
         self._title = title
         self._credit_hours = credit_hours
         self._lecturer = lecturer
-        self._students: List[Student] = []
+        self._students: Dict[str, Student] = {}  # Indexed by student id
 
     @property
     def code(self) -> str:
@@ -202,14 +735,41 @@ class Course:
     def lecturer(self, lecturer: 'Lecturer') -> None:
         self._lecturer = lecturer
 
+    @property
+    def students(self) -> ValuesView[Student]:
+        return self._students.values()  # Live read-only view, no copy
+
+    def use_storage(self, students: MutableMapping[str, Student]) -> None:
+        """Move this course's enrollments into a storage-backed mapping"""
+        students.update(self._students)
+        self._students = students
+
+    def has_student(self, student_id: str) -> bool:
+        """Check if a student is enrolled in the course"""
+        return student_id in self._students
+
     def enroll_student(self, student: Student) -> bool:
         """Enroll a student in the course"""
         if student.register_course(self):
-            self._students.append(student)
-            print(f"{student.name} added to {self._title}")
+            self._students[student.person_id] = student
+            emit_event('student_enrolled', student_id=student.person_id, name=student.name,
+                       code=self._code, title=self._title)
             return True
         return False
 
+    def enroll_students(self, students: Iterable[Student]) -> int:
+        """Enroll many students at once without per-student output; returns how many were new"""
+        audit = _event_sink.enabled
+        added = 0
+        for student in students:
+            if student.person_id not in self._students and student.add_course(self):
+                self._students[student.person_id] = student
+                added += 1
+                if audit:
+                    emit_event('student_enrolled', student_id=student.person_id,
+                               name=student.name, code=self._code, title=self._title)
+        return added
+
     def get_student_count(self) -> int:
         """Get the number of enrolled students"""
         return len(self._students)
@@ -219,7 +779,7 @@ class Course:
         lecturer_name = self._lecturer.name if self._lecturer else 'TBA'
         print(f"{self._code}: {self._title}, Credits: {self._credit_hours}, Lecturer: {lecturer_name}")
         print("Enrolled students:")
-        for student in self._students:
+        for student in self._students.values():
             print(f"- {student.name}")
 
 
@@ -230,22 +790,28 @@ class Lecturer(Person):
         super().__init__(staff_id, name, email)
         self._role = "Lecturer"
         self._department = department
-        self._courses: List[Course] = []
+        self._courses: Dict[str, Course] = {}  # Indexed by course code
 
     @property
     def department(self) -> str:
         return self._department
 
     @property
-    def courses(self) -> List[Course]:
-        return self._courses.copy()  # Return copy for encapsulation
+    def courses(self) -> ValuesView[Course]:
+        return self._courses.values()  # Live read-only view, no copy
+
+    def use_storage(self, courses: MutableMapping[str, Course]) -> None:
+        """Move this lecturer's course assignments into a storage-backed mapping"""
+        courses.update(self._courses)
+        self._courses = courses
 
     def assign_course(self, course: Course) -> bool:
         """Assign lecturer to a course"""
-        if course not in self._courses:
-            self._courses.append(course)
+        if course.code not in self._courses:
+            self._courses[course.code] = course
             course.lecturer = self
-            print(f"{self._name} assigned to {course.title}")
+            emit_event('lecturer_assigned', staff_id=self._person_id, name=self._name,
+                       code=course.code, title=course.title)
             return True
         return False
 
@@ -253,73 +819,458 @@ class Lecturer(Person):
         """Submit grades for students (uses proper encapsulation)"""
         for student in students:
             student.add_grade(course_code, grade)
-            print(f"Assigned grade {grade} to {student.name} for {course_code}")
+            emit_event('grade_submitted', staff_id=self._person_id, student_id=student.person_id,
+                       name=student.name, code=course_code, grade=grade)
 
     def print_summary(self) -> None:
         """Print lecturer summary"""
         print(f"Lecturer: {self._name}")
-        for course in self._courses:
+        for course in self._courses.values():
             print(f"Teaching: {course.title} ({course.get_student_count()} students)")
 
 
+class ReportSink(ABC):
+    """Buffered report output: rows are rendered to text and written in large chunks"""
+    
+    def __init__(self, stream: TextIO, buffer_size: int = 1 << 16):
+        self._stream = stream
+        self._buffer_size = buffer_size
+        self._buffer = io.StringIO()
+
+    @abstractmethod
+    def render(self, row: Dict) -> str:
+        """The text written for one row"""
+
+    def write(self, row: Dict) -> None:
+        self._buffer.write(self.render(row))
+        if self._buffer.tell() >= self._buffer_size:
+            self._drain()
+
+    def write_rows(self, rows: Iterable[Dict]) -> int:
+        """write() for each row; returns how many were written"""
+        render, buffer, limit = self.render, self._buffer, self._buffer_size
+        count = 0
+        for row in rows:
+            buffer.write(render(row))
+            count += 1
+            if buffer.tell() >= limit:
+                self._drain()
+        return count
+
+    def _drain(self) -> None:
+        self._stream.write(self._buffer.getvalue())
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+    def flush(self) -> None:
+        self._drain()
+        self._stream.flush()
+
+
+class TextSink(ReportSink):
+    """The report as readable lines, as the console report prints it"""
+    
+    MESSAGES = {level.name: level.value for level in PerformanceLevel}
+    
+    def __init__(self, stream: TextIO, buffer_size: int = 1 << 16, title: Optional[str] = None):
+        super().__init__(stream, buffer_size)
+        if title is not None:
+            self._buffer.write(title + '\n')
+
+    def render(self, row: Dict) -> str:
+        kind = row['kind']
+        if kind == 'course':
+            return (f"{row['code']}: {row['title']}, Credits: {row['credit_hours']}, "
+                    f"Lecturer: {row['lecturer'] or 'TBA'}\nEnrolled students:\n")
+        if kind == 'enrollment':
+            return f"- {row['name']}\n"
+        if kind == 'lecturer':
+            return f"Lecturer: {row['name']}\n"
+        if kind == 'teaching':
+            return f"Teaching: {row['title']} ({row['students']} students)\n"
+        line = f"GPA: {row['gpa']}, Attendance: {row['attendance']:.1f}%\n"
+        message = self.MESSAGES[row['performance']]
+        return line + message + '\n' if message else line
+
+
+class CsvSink(ReportSink):
+    """One CSV row per report row, with a column for every field any row kind uses"""
+    
+    FIELDS = ['kind', 'code', 'title', 'credit_hours', 'lecturer', 'staff_id', 'student_id',
+              'name', 'department', 'students', 'gpa', 'attendance', 'performance']
+    
+    def __init__(self, stream: TextIO, buffer_size: int = 1 << 16):
+        super().__init__(stream, buffer_size)
+        self._csv = csv.writer(self._buffer, lineterminator='\n')
+        self._csv.writerow(self.FIELDS)
+
+    def render(self, row: Dict) -> str:
+        line = io.StringIO()
+        csv.writer(line, lineterminator='\n').writerow([row.get(field) for field in self.FIELDS])
+        return line.getvalue()
+
+    def write(self, row: Dict) -> None:
+        self.write_rows((row,))
+
+    def write_rows(self, rows: Iterable[Dict]) -> int:
+        writerow, buffer, limit = self._csv.writerow, self._buffer, self._buffer_size
+        fields = self.FIELDS
+        count = 0
+        for row in rows:
+            writerow([row.get(field) for field in fields])  # None is written as an empty cell
+            count += 1
+            if buffer.tell() >= limit:
+                self._drain()
+        return count
+
+
+class JsonlSink(ReportSink):
+    """One JSON object per report row"""
+    
+    def __init__(self, stream: TextIO, buffer_size: int = 1 << 16):
+        super().__init__(stream, buffer_size)
+        # json.dumps builds a new encoder per call when given options; reuse one
+        self._encode = json.JSONEncoder(separators=(',', ':')).encode
+
+    def render(self, row: Dict) -> str:
+        return self._encode(row) + '\n'
+
+
 class ReportGenerator:
-    """Separated responsibility for report generation"""
+    """Separated responsibility for report generation
     
+    The report is a stream of rows (dicts with a `kind`), built lazily so
+    sinks can write it as it is produced. Sections and pages can be selected;
+    a page is `page_size` courses, lecturers or students of each section,
+    and nothing is computed for the ones skipped.
+    """
+    SECTIONS = ('courses', 'lecturers', 'students')
+    SINKS = {'text': TextSink, 'csv': CsvSink, 'jsonl': JsonlSink}
+    TITLE = "=== Full University Report ==="
+    
+    def __init__(self, page_size: int = 100):
+        self._page_size = page_size
+
+    def _page(self, items: Iterable, pages: Optional[range]) -> Iterator:
+        if pages is None:
+            return iter(items)
+        return islice(items, pages.start * self._page_size, pages.stop * self._page_size)
+
+    def rows(self, registrar: 'Registrar', sections: Iterable[str] = SECTIONS,
+             pages: Optional[range] = None) -> Iterator[Dict]:
+        """Rows of the selected sections, in the given order, limited to `pages` if given"""
+        for section in sections:
+            if section not in self.SECTIONS:
+                raise ValueError(f"Unknown report section: {section}")
+            if section == 'courses':
+                for course in self._page(registrar.get_courses(), pages):
+                    yield from self._course_rows(course)
+            elif section == 'lecturers':
+                for lecturer in self._page(registrar.get_lecturers(), pages):
+                    yield from self._lecturer_rows(lecturer)
+            else:
+                yield from self._student_rows(self._page(registrar.get_students(), pages))
+
+    @staticmethod
+    def _course_rows(course: Course) -> Iterator[Dict]:
+        lecturer = course.lecturer
+        yield {'kind': 'course', 'code': course.code, 'title': course.title,
+               'credit_hours': course.credit_hours,
+               'lecturer': lecturer.name if lecturer else None}
+        for student in course.students:
+            yield {'kind': 'enrollment', 'code': course.code, 'student_id': student.person_id,
+                   'name': student.name}
+
+    @staticmethod
+    def _lecturer_rows(lecturer: Lecturer) -> Iterator[Dict]:
+        yield {'kind': 'lecturer', 'staff_id': lecturer.person_id, 'name': lecturer.name,
+               'department': lecturer.department}
+        for course in lecturer.courses:
+            yield {'kind': 'teaching', 'staff_id': lecturer.person_id, 'code': course.code,
+                   'title': course.title, 'students': course.get_student_count()}
+
+    @staticmethod
+    def _student_rows(students: Iterator[Student]) -> Iterator[Dict]:
+        evaluate = PerformanceEvaluator.evaluate_performance
+        level_names = {level: level.name for level in PerformanceLevel}
+        for student in students:
+            gpa, attendance = student.gpa(), student.average_attendance()  # Running totals
+            yield {'kind': 'student', 'student_id': student.person_id, 'name': student.name,
+                   'gpa': gpa, 'attendance': attendance,
+                   'performance': level_names[evaluate(gpa, attendance)]}
+
+    def write(self, registrar: 'Registrar', sink: ReportSink,
+              sections: Iterable[str] = SECTIONS, pages: Optional[range] = None) -> int:
+        """Send the selected rows to `sink` and flush it; returns the number of rows"""
+        count = sink.write_rows(self.rows(registrar, sections, pages))
+        sink.flush()
+        return count
+
     @staticmethod
     def generate_full_report(registrar: 'Registrar') -> None:
         """Generate full university report"""
-        print("=== Full University Report ===")
-        
-        for course in registrar.get_courses():
-            course.display_details()
-        
-        for lecturer in registrar.get_lecturers():
-            lecturer.print_summary()
-        
-        for student in registrar.get_students():
-            student.calculate_performance()
+        ReportGenerator().write(registrar, TextSink(sys.stdout, title=ReportGenerator.TITLE))
 
 
 class Registrar:
-    """Registrar class with improved encapsulation and reduced coupling"""
+    """Registrar class with improved encapsulation and reduced coupling
+    
+    Records live in memory unless a storage backend is given, e.g.
+    registration_storage.SQLiteStorage, whose tables stand in for the indexes.
+    """
     
-    def __init__(self):
-        self._students: List[Student] = []
-        self._courses: List[Course] = []
-        self._lecturers: List[Lecturer] = []
+    def __init__(self, storage=None):
+        self._storage = storage
+        if storage is None:
+            # Indexed by person id / course code; dicts keep insertion order
+            self._students: MutableMapping[str, Student] = {}
+            self._courses: MutableMapping[str, Course] = {}
+            self._lecturers: MutableMapping[str, Lecturer] = {}
+        else:
+            self._students = storage.students
+            self._courses = storage.courses
+            self._lecturers = storage.lecturers
+
+    @contextmanager
+    def transaction(self):
+        """Group writes so a storage backend commits them together (a no-op in memory)"""
+        if self._storage is None:
+            yield
+        else:
+            with self._storage.transaction():
+                yield
 
-    def add_student(self, student: Student) -> None:
-        """Add a student to the system"""
-        self._students.append(student)
-        print(f"Added student {student.name}")
+    def add_student(self, student: Student) -> bool:
+        """Add a student to the system unless the id is already taken"""
+        if student.person_id in self._students:
+            emit_event('student_rejected', student_id=student.person_id, name=student.name)
+            return False
+        self._students[student.person_id] = student
+        emit_event('student_added', student_id=student.person_id, name=student.name)
+        return True
+
+    def add_students(self, students: Iterable[Student]) -> int:
+        """Add many students without per-student output; returns how many were new"""
+        audit = _event_sink.enabled
+        added = 0
+        for student in students:
+            if student.person_id not in self._students:
+                self._students[student.person_id] = student
+                added += 1
+                if audit:
+                    emit_event('student_added', student_id=student.person_id, name=student.name)
+        return added
+
+    def add_course(self, course: Course) -> bool:
+        """Add a course to the system unless the code is already taken"""
+        if course.code in self._courses:
+            return False
+        self._courses[course.code] = course
+        return True
+
+    def add_lecturer(self, lecturer: Lecturer) -> bool:
+        """Add a lecturer to the system unless the id is already taken"""
+        if lecturer.person_id in self._lecturers:
+            return False
+        self._lecturers[lecturer.person_id] = lecturer
+        return True
 
-    def add_course(self, course: Course) -> None:
-        """Add a course to the system"""
-        self._courses.append(course)
+    def find_student(self, student_id: str) -> Optional[Student]:
+        """Look up a student by id"""
+        return self._students.get(student_id)
 
-    def add_lecturer(self, lecturer: Lecturer) -> None:
-        """Add a lecturer to the system"""
-        self._lecturers.append(lecturer)
+    def find_course(self, code: str) -> Optional[Course]:
+        """Look up a course by code"""
+        return self._courses.get(code)
 
-    def get_students(self) -> List[Student]:
-        """Get list of students (encapsulated access)"""
-        return self._students.copy()
+    def find_lecturer(self, staff_id: str) -> Optional[Lecturer]:
+        """Look up a lecturer by staff id"""
+        return self._lecturers.get(staff_id)
 
-    def get_courses(self) -> List[Course]:
-        """Get list of courses (encapsulated access)"""
-        return self._courses.copy()
+    def get_students(self) -> ValuesView[Student]:
+        """Live read-only view of the students (encapsulated access)"""
+        return self._students.values()
 
-    def get_lecturers(self) -> List[Lecturer]:
-        """Get list of lecturers (encapsulated access)"""
-        return self._lecturers.copy()
+    def get_courses(self) -> ValuesView[Course]:
+        """Live read-only view of the courses (encapsulated access)"""
+        return self._courses.values()
+
+    def get_lecturers(self) -> ValuesView[Lecturer]:
+        """Live read-only view of the lecturers (encapsulated access)"""
+        return self._lecturers.values()
 
     def full_report(self) -> None:
         """Generate full report using ReportGenerator"""
         ReportGenerator.generate_full_report(self)
 
 
+class ImportReport:
+    """Outcome of a bulk import: rows read, records added and per-row errors"""
+    
+    def __init__(self, max_errors: int = 1000):
+        self.rows = 0
+        self.added = 0
+        self.error_count = 0
+        self.errors: List[Tuple[int, str]] = []  # (line, message), first `max_errors` only
+        self._max_errors = max_errors
+
+    def add_error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < self._max_errors:
+            self.errors.append((line, message))
+
+
+class BulkImporter:
+    """Streams students, courses and enrollments from CSV or JSON Lines into a Registrar
+    
+    Rows are read incrementally and handled in batches, so memory use
+    depends on the batch size rather than the file size. Invalid rows are
+    reported by line number and skipped. With `pause_gc`, cyclic garbage
+    collection is suspended during student and enrollment imports, which
+    saves rescanning the growing registry. The pause applies to the whole
+    process, so only opt in when nothing else depends on collection meanwhile.
+    """
+    
+    STUDENT_FIELDS = ('student_id', 'name', 'email')
+    COURSE_FIELDS = ('code', 'title', 'credit_hours')
+    ENROLLMENT_FIELDS = ('student_id', 'course_code')
+    
+    def __init__(self, registrar: 'Registrar', batch_size: int = 10000, max_errors: int = 1000,
+                 pause_gc: bool = False):
+        self._registrar = registrar
+        self._batch_size = batch_size
+        self._max_errors = max_errors
+        self._pause_gc = pause_gc
+
+    @contextmanager
+    def _gc_paused(self):
+        """Suspend cyclic GC if the caller opted in with `pause_gc`"""
+        enabled = gc.isenabled()
+        if not (self._pause_gc and enabled):
+            yield
+            return
+        gc.disable()
+        try:
+            yield
+        finally:
+            gc.enable()
+
+    @staticmethod
+    def read_rows(path: str, fields: Tuple[str, ...]) -> Iterator[Tuple[int, List[str], str]]:
+        """(line, values, error) per record of a .csv or .jsonl file
+        
+        Values are the stripped strings of `fields` in order, '' where absent.
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in ('.csv', '.jsonl', '.ndjson'):
+            raise ValueError(f"Unsupported import format: {path}")
+        with open(path, newline='', encoding='utf-8') as f:
+            if extension == '.csv':
+                reader = csv.reader(f)
+                header = [name.strip() for name in next(reader, [])]
+                # Absent columns read the '' appended to every row
+                columns = [header.index(field) if field in header else -1 for field in fields]
+                for row in reader:
+                    if not row:
+                        continue
+                    row.append('')
+                    try:
+                        yield reader.line_num, [row[i].strip() for i in columns], None
+                    except IndexError:
+                        yield reader.line_num, None, f"Expected {len(header)} columns"
+                return
+            for line, text in enumerate(f, 1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except ValueError as e:
+                    yield line, None, f"Invalid JSON: {e}"
+                    continue
+                if not isinstance(row, dict):
+                    yield line, None, "Expected a JSON object"
+                    continue
+                yield line, [str(row.get(field) if row.get(field) is not None else '').strip()
+                             for field in fields], None
+
+    def _batches(self, path: str, fields: Tuple[str, ...], report: ImportReport,
+                 optional: Tuple[str, ...] = ()) -> Iterator[List[Tuple[int, List[str]]]]:
+        """Batches of (line, values) whose required `fields` are all present"""
+        required = len(fields)
+        rows = self.read_rows(path, fields + optional)
+        while True:
+            chunk = list(islice(rows, self._batch_size))
+            if not chunk:
+                return
+            report.rows += len(chunk)
+            batch = []
+            for line, values, error in chunk:
+                if error is None and not all(values[:required]):
+                    missing = [field for field, value in zip(fields, values) if not value]
+                    error = f"Missing {', '.join(missing)}"
+                if error is None:
+                    batch.append((line, values))
+                else:
+                    report.add_error(line, error)
+            yield batch
+
+    def import_students(self, path: str) -> ImportReport:
+        """Add students from rows with student_id, name, email and optional phone"""
+        report = ImportReport(self._max_errors)
+        find_student = self._registrar.find_student
+        with self._gc_paused():
+            for batch in self._batches(path, self.STUDENT_FIELDS, report, ('phone',)):
+                students = []
+                seen = set()
+                for line, (student_id, name, email, phone) in batch:
+                    if student_id in seen or find_student(student_id) is not None:
+                        report.add_error(line, f"Duplicate student {student_id}")
+                        continue
+                    seen.add(student_id)
+                    students.append(Student(student_id, name, email, phone or None))
+                report.added += self._registrar.add_students(students)
+        return report
+
+    def import_courses(self, path: str) -> ImportReport:
+        """Add courses from rows with code, title and credit_hours"""
+        report = ImportReport(self._max_errors)
+        for batch in self._batches(path, self.COURSE_FIELDS, report):
+            for line, (code, title, credit_hours) in batch:
+                if not credit_hours.isdigit() or int(credit_hours) <= 0:
+                    report.add_error(line, f"Invalid credit_hours {credit_hours!r}")
+                elif self._registrar.add_course(Course(code, title, int(credit_hours))):
+                    report.added += 1
+                else:
+                    report.add_error(line, f"Duplicate course {code}")
+        return report
+
+    def import_enrollments(self, path: str) -> ImportReport:
+        """Enroll students from rows with student_id and course_code, one batch per course"""
+        report = ImportReport(self._max_errors)
+        find_student, find_course = self._registrar.find_student, self._registrar.find_course
+        with self._gc_paused():
+            for batch in self._batches(path, self.ENROLLMENT_FIELDS, report):
+                by_course: Dict[Course, List[Student]] = {}
+                seen = set()
+                for line, (student_id, code) in batch:
+                    student, course = find_student(student_id), find_course(code)
+                    if student is None:
+                        report.add_error(line, f"Unknown student {student_id}")
+                    elif course is None:
+                        report.add_error(line, f"Unknown course {code}")
+                    elif (student_id, code) in seen or course.has_student(student_id):
+                        report.add_error(line, f"Duplicate enrollment {student_id} in {code}")
+                    else:
+                        seen.add((student_id, code))
+                        by_course.setdefault(course, []).append(student)
+                for course, students in by_course.items():
+                    report.added += course.enroll_students(students)
+        return report
+
+
 def main():
     """Main function with improved structure"""
+    set_event_sink(PrintEventSink())  # Show each step on the console
     reg = Registrar()
 
     # Create courses
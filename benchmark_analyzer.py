@@ -0,0 +1,249 @@
+"""
+Benchmark suite for the Metric Analysis Tool
+Generates reproducible synthetic sources, times each metric phase, tracks
+peak memory, and saves results so runs can be compared across versions
+"""
+import argparse
+import ast
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from metric_analyzer import (
+    ANALYZER_VERSION, MetricAnalyzer, build_inheritance_graph, calculate_cbo, calculate_lcom,
+    calculate_lcom4, compute_hierarchy
+)
+
+
+class LegacyMetricAnalyzer(ast.NodeVisitor):
+    """The visitor from before the single-pass changes, copied verbatim for comparison"""
+    
+    def __init__(self):
+        self.classes = {}
+        self.methods = {}
+        self.current_class = None
+        self.current_method = None
+        self.complexity = {}
+        self.loc = {}
+        self.couplings = {}  # CBO tracking
+        
+    def visit_ClassDef(self, node):
+        self.current_class = node.name
+        self.classes[node.name] = {
+            'methods': [],
+            'bases': [base.id for base in node.bases if isinstance(base, ast.Name)],
+            'attributes': set()
+        }
+        self.generic_visit(node)
+        self.current_class = None
+        
+    def visit_FunctionDef(self, node):
+        if self.current_class:
+            method_name = f"{self.current_class}.{node.name}"
+            self.current_method = method_name
+            self.classes[self.current_class]['methods'].append(node.name)
+            
+            # Calculate LOC (excluding blank lines and comments)
+            loc = len([n for n in ast.walk(node) if isinstance(n, (ast.stmt, ast.expr))])
+            self.loc[method_name] = loc
+            
+            # Calculate Cyclomatic Complexity
+            cc = 1  # Base complexity
+            for child in ast.walk(node):
+                if isinstance(child, (ast.If, ast.While, ast.For, ast.ExceptHandler)):
+                    cc += 1
+                elif isinstance(child, ast.BoolOp):
+                    cc += len(child.values) - 1
+            self.complexity[method_name] = cc
+            
+            # Track attributes accessed
+            attrs = set()
+            for child in ast.walk(node):
+                if isinstance(child, ast.Attribute):
+                    if isinstance(child.value, ast.Name) and child.value.id == 'self':
+                        attrs.add(child.attr)
+            self.classes[self.current_class]['attributes'].update(attrs)
+            
+        self.generic_visit(node)
+        self.current_method = None
+
+
+def generate_nested_source(classes: int = 50, depth: int = 6) -> str:
+    """Generate classes whose methods nest functions and classes `depth` levels deep"""
+    lines = []
+    for c in range(classes):
+        lines.append(f"class Model{c}:")
+        indent = "    "
+        for level in range(depth):
+            lines.append(f"{indent}def method_{level}(self, value):")
+            lines.append(f"{indent}    if value and self.flag_{level}:")
+            lines.append(f"{indent}        value = [x for x in range(value) if x % 2]")
+            lines.append(f"{indent}    for item in self.items_{level}:")
+            lines.append(f"{indent}        self.total += item")
+            if level % 2:
+                lines.append(f"{indent}    class Inner{level}:")
+                indent += "        "
+            else:
+                indent += "    "
+        lines.append(f"{indent}return value")
+    return "\n".join(lines) + "\n"
+
+
+def generate_corpus(classes: int = 100, methods: int = 8, statements: int = 6, nesting: int = 2,
+                    inheritance_depth: int = 3, coupling: float = 0.2, seed: int = 0) -> str:
+    """Generate a synthetic module with the given shape
+    
+    Classes form inheritance chains `inheritance_depth` long; each method has
+    `statements` blocks nested `nesting` levels deep, and each block references
+    another class with probability `coupling`.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for c in range(classes):
+        base = f"(Model{c - 1})" if c % inheritance_depth else ""
+        lines.append(f"class Model{c}{base}:")
+        for m in range(methods):
+            lines.append(f"    def method_{m}(self, value):")
+            for s in range(statements):
+                indent = "        "
+                for level in range(nesting):
+                    if level % 2:
+                        lines.append(f"{indent}for item_{level} in self.items_{rng.randrange(methods)}:")
+                    else:
+                        lines.append(f"{indent}if value > {s} and self.flag_{rng.randrange(methods)}:")
+                    indent += "    "
+                lines.append(f"{indent}self.total_{rng.randrange(methods)} = value + {s}")
+                if rng.random() < coupling:
+                    lines.append(f"{indent}Model{rng.randrange(classes)}.method_0(self, value)")
+            lines.append(f"        return self.method_{(m + 1) % methods}(value)")
+    return "\n".join(lines) + "\n"
+
+def time_visitor(visitor_class: Callable, tree: ast.AST, repeat: int = 5) -> float:
+    """Best-of-`repeat` wall time for visiting `tree`"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        visitor_class().visit(tree)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_phases(source: str) -> Dict[str, float]:
+    """Wall time of each metric phase over `source`"""
+    timings = {}
+    
+    start = time.perf_counter()
+    tree = ast.parse(source)
+    timings['parse'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    analyzer = MetricAnalyzer()
+    analyzer.visit(tree)
+    timings['visit'] = time.perf_counter() - start
+    classes = analyzer.classes
+    
+    start = time.perf_counter()
+    for class_name in classes:
+        calculate_cbo(class_name, classes)
+    timings['cbo'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    compute_hierarchy(build_inheritance_graph([{'classes': classes, 'imports': analyzer.imports}]))
+    timings['dit_noc'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for class_name in classes:
+        calculate_lcom(class_name, classes)
+        calculate_lcom4(class_name, classes)
+    timings['lcom'] = time.perf_counter() - start
+    
+    timings['total'] = sum(timings.values())
+    return timings
+
+def benchmark(params: Dict, repeat: int = 5) -> Dict:
+    """Best-of-`repeat` phase timings plus the peak memory of one traced run"""
+    source = generate_corpus(**params)
+    best = {}
+    for _ in range(repeat):
+        for phase, seconds in run_phases(source).items():
+            best[phase] = min(best.get(phase, float('inf')), seconds)
+    
+    # Traced separately, since tracemalloc slows everything it measures
+    tracemalloc.start()
+    run_phases(source)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        'analyzer_version': ANALYZER_VERSION,
+        'python': platform.python_version(),
+        'params': params,
+        'source_bytes': len(source),
+        'timings': best,
+        'peak_memory': peak
+    }
+
+def print_results(results: Dict, baseline: Dict = None) -> None:
+    print("=" * 60)
+    print(f"BENCHMARK (analyzer version {results['analyzer_version']}, "
+          f"{results['source_bytes'] // 1024} KB source)")
+    print("=" * 60)
+    for phase, seconds in results['timings'].items():
+        line = f"  {phase:20s} {seconds * 1000:10.2f} ms"
+        if baseline and phase in baseline['timings']:
+            line += f"   {seconds / baseline['timings'][phase]:6.2f}x baseline"
+        print(line)
+    line = f"  {'peak memory':20s} {results['peak_memory'] / 1024 / 1024:10.2f} MB"
+    if baseline:
+        line += f"   {results['peak_memory'] / baseline['peak_memory']:6.2f}x baseline"
+    print(line)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the metric analyzer on synthetic code")
+    parser.add_argument("--classes", type=int, default=100)
+    parser.add_argument("--methods", type=int, default=8, help="methods per class")
+    parser.add_argument("--statements", type=int, default=6, help="statement blocks per method")
+    parser.add_argument("--nesting", type=int, default=2, help="nesting depth of each block")
+    parser.add_argument("--inheritance-depth", type=int, default=3)
+    parser.add_argument("--coupling", type=float, default=0.2,
+                        help="probability a block references another class")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", default=None, help="write results as JSON to this file")
+    parser.add_argument("--compare", default=None, help="JSON results of an earlier run")
+    parser.add_argument("--legacy", action="store_true",
+                        help="also compare the visitor against the original (baseline) visitor")
+    args = parser.parse_args(argv)
+    
+    params = {'classes': args.classes, 'methods': args.methods, 'statements': args.statements,
+              'nesting': args.nesting, 'inheritance_depth': args.inheritance_depth,
+              'coupling': args.coupling, 'seed': args.seed}
+    results = benchmark(params, args.repeat)
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['params'] != params:
+            print("Warning: baseline was generated with different corpus parameters")
+    print_results(results, baseline)
+    
+    if args.legacy:
+        tree = ast.parse(generate_nested_source())
+        legacy = time_visitor(LegacyMetricAnalyzer, tree, args.repeat)
+        fused = time_visitor(MetricAnalyzer, tree, args.repeat)
+        print(f"\n  {'Legacy visitor (nested)':30s} {legacy * 1000:8.2f} ms")
+        print(f"  {'Single-pass visitor (nested)':30s} {fused * 1000:8.2f} ms")
+        print(f"  {'Speedup':30s} {legacy / fused:8.2f}x")
+    
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
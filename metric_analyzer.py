@@ -1,12 +1,41 @@
 """
 Metric Analysis Tool for University Course Registration System
-Calculates: CC, LOC, CBO, DIT, LCOM
+Calculates: CC, LOC, CBO, DIT, NOC, LCOM, Halstead volume and MI
 """
+import argparse
 import ast
+import csv
+import json
+import math
+import os
 import sys
-from typing import Dict, List, Set, Tuple
+import time
+import multiprocessing
+import queue
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterator, List, Set, TextIO, Tuple
+
+from metric_cache import DEFAULT_MAX_BYTES, ResultCache
+from metric_files import find_python_files
+from metric_profile import Profiler, maybe_phase
+from metric_records import ClassRecord, RecordSpool, StringTable
+from metric_store import MetricStore, np
+
+# Bump whenever a change alters the metrics, so cached results are not reused
+ANALYZER_VERSION = "6"
+LOOP_NODES = (ast.For, ast.AsyncFor, ast.While)
+TRY_NODES = (ast.Try, ast.TryStar) if hasattr(ast, 'TryStar') else (ast.Try,)
+DECISION_NODES = (ast.If, ast.IfExp, *LOOP_NODES, *TRY_NODES, ast.BoolOp, ast.comprehension,
+                  ast.match_case)
+OUTPUT_BUFFER = 1024 * 1024  # Large writes for jsonl/csv output files
+GATE_METRICS = ('cc', 'loc', 'cbo', 'dit', 'noc', 'lcom1', 'lcom4')
+COMPLEXITY_METRICS = {'cc', 'loc', 'dit', 'noc'}  # Gates ComplexityAnalyzer can answer
+FAIL_FAST_CHUNK = 4  # Files per worker task with --fail-fast, so a violation surfaces early
 
 class MetricAnalyzer(ast.NodeVisitor):
+    cacheable = True  # Results hold every metric, so they can be shared through the cache
+    
     def __init__(self):
         self.classes = {}
         self.methods = {}
@@ -15,150 +44,988 @@ class MetricAnalyzer(ast.NodeVisitor):
         self.complexity = {}
         self.loc = {}
         self.couplings = {}  # CBO tracking
+        self.halstead = {}  # Method -> [distinct operators, distinct operands, operators, operands]
+        self.mi = {}  # Method -> Maintainability Index
+        self.imports = {}  # Local name -> imported dotted name, for resolving bases
         
     def visit_ClassDef(self, node):
-        self.current_class = node.name
-        self.classes[node.name] = {
+        enclosing_class = self.current_class
+        # Nested classes are qualified by the enclosing one, e.g. `Model.Meta`
+        class_name = qualify(enclosing_class, node.name)
+        self.current_class = class_name
+        self.classes[class_name] = {
             'methods': [],
-            'bases': [base.id for base in node.bases if isinstance(base, ast.Name)],
-            'attributes': set()
+            'bases': [name for name in map(base_name, node.bases) if name],
+            'attributes': set(),
+            'references': set(),  # Names used in the body, resolved to classes for CBO
+            'method_attributes': {}  # self.<name> accesses per method, for LCOM
         }
-        self.generic_visit(node)
-        self.current_class = None
+        # Only the body is visited so base classes don't count as couplings
+        for stmt in node.body:
+            self.visit(stmt)
+        self.build_cohesion_masks(self.classes[class_name])
+        self.current_class = enclosing_class
+
+    def build_cohesion_masks(self, info):
+        """Encode each method's attribute accesses as a bitmask over the class attributes"""
+        methods = set(info['methods'])
+        bits = {attr: 1 << i for i, attr in enumerate(sorted(info['attributes']))}
+        info['method_masks'] = {}
+        info['method_calls'] = {}
+        for method, names in info['method_attributes'].items():
+            mask = 0
+            for name in names:
+                if name not in methods:  # self.<method> is a call, not shared state
+                    mask |= bits[name]
+            info['method_masks'][method] = mask
+            info['method_calls'][method] = sorted(names & methods)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            if alias.asname:
+                self.imports[alias.asname] = alias.name
+            else:
+                head = alias.name.split('.', 1)[0]
+                self.imports[head] = head
+
+    def visit_ImportFrom(self, node):
+        # Relative imports keep their leading dots until the module is known
+        source = '.' * node.level + (node.module or '')
+        for alias in node.names:
+            if alias.name != '*':
+                target = f"{source}.{alias.name}" if node.module else source + alias.name
+                self.imports[alias.asname or alias.name] = target
+
+    def visit_Name(self, node):
+        if self.current_class:
+            self.classes[self.current_class]['references'].add(node.id)
         
     def visit_FunctionDef(self, node):
-        if self.current_class:
-            method_name = f"{self.current_class}.{node.name}"
-            self.current_method = method_name
-            self.classes[self.current_class]['methods'].append(node.name)
+        if self.current_class and self.current_method is None:
+            self.measure_method(node)
+        else:
+            # Module-level functions aren't measured, but may define classes
+            self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def measure_method(self, node):
+        """Record a method's metrics against the current class"""
+        method_name = f"{self.current_class}.{node.name}"
+        self.current_method = method_name
+        self.classes[self.current_class]['methods'].append(node.name)
+        
+        loc, cc, attrs, references, halstead, lines = self.method_metrics(node)
+        
+        self.loc[method_name] = loc
+        self.complexity[method_name] = cc
+        self.halstead[method_name] = halstead
+        self.mi[method_name] = maintainability_index(halstead_volume(*halstead), cc, lines)
+        self.classes[self.current_class]['attributes'].update(attrs)
+        self.classes[self.current_class]['references'].update(references)
+        self.classes[self.current_class]['method_attributes'].setdefault(node.name, set()).update(attrs)
+        self.current_method = None
+
+    def method_metrics(self, node) -> Tuple[int, int, Set[str], Set[str], List[int], int]:
+        """Gather LOC, CC, self-attributes, references, Halstead counts and code lines in one traversal
+        
+        Operators and operands are counted as radon does: each BinOp, UnaryOp,
+        BoolOp, AugAssign and Compare contributes its operator(s) and the
+        expressions they apply to. Code lines are the lines a statement or
+        expression starts on, docstring excluded, so comments and blank lines
+        don't lower the MI.
+        """
+        method_name = self.current_method
+        loc = 0  # Count of stmt/expr nodes
+        cc = 1  # Base complexity
+        lines = set()
+        attrs = set()
+        references = set()
+        operators = operands = 0
+        distinct_operators = set()
+        distinct_operands = set()
+        stack = [node]
+        while stack:
+            child = stack.pop()
+            if isinstance(child, ast.ClassDef):
+                # A nested class is its own scope with its own methods
+                self.current_method = None
+                self.visit(child)
+                self.current_method = method_name
+                continue
             
-            # Calculate LOC (excluding blank lines and comments)
-            loc = len([n for n in ast.walk(node) if isinstance(n, (ast.stmt, ast.expr))])
-            self.loc[method_name] = loc
+            if isinstance(child, (ast.stmt, ast.expr)):
+                loc += 1
+                lines.add(child.lineno)
             
-            # Calculate Cyclomatic Complexity
-            cc = 1  # Base complexity
-            for child in ast.walk(node):
-                if isinstance(child, (ast.If, ast.While, ast.For, ast.ExceptHandler)):
-                    cc += 1
-                elif isinstance(child, ast.BoolOp):
-                    cc += len(child.values) - 1
-            self.complexity[method_name] = cc
+            # Decision points; nested functions count towards the method
+            if isinstance(child, DECISION_NODES):
+                cc += decision_points(child)
             
-            # Track attributes accessed
-            attrs = set()
-            for child in ast.walk(node):
-                if isinstance(child, ast.Attribute):
-                    if isinstance(child.value, ast.Name) and child.value.id == 'self':
-                        attrs.add(child.attr)
-            self.classes[self.current_class]['attributes'].update(attrs)
+            if isinstance(child, ast.BoolOp):
+                operators += 1
+                operands += len(child.values)
+                distinct_operators.add(type(child.op))
+                distinct_operands.update(map(operand_key, child.values))
+            elif isinstance(child, ast.Name):
+                references.add(child.id)
+            elif isinstance(child, ast.Attribute):
+                if isinstance(child.value, ast.Name) and child.value.id == 'self':
+                    attrs.add(child.attr)
+            elif isinstance(child, (ast.BinOp, ast.AugAssign)):
+                operators += 1
+                operands += 2
+                distinct_operators.add(type(child.op))
+                left = child.left if isinstance(child, ast.BinOp) else child.target
+                right = child.right if isinstance(child, ast.BinOp) else child.value
+                distinct_operands.add(operand_key(left))
+                distinct_operands.add(operand_key(right))
+            elif isinstance(child, ast.UnaryOp):
+                operators += 1
+                operands += 1
+                distinct_operators.add(type(child.op))
+                distinct_operands.add(operand_key(child.operand))
+            elif isinstance(child, ast.Compare):
+                operators += len(child.ops)
+                operands += len(child.comparators) + 1
+                distinct_operators.update(map(type, child.ops))
+                distinct_operands.add(operand_key(child.left))
+                distinct_operands.update(map(operand_key, child.comparators))
             
-        self.generic_visit(node)
+            stack.extend(ast.iter_child_nodes(child))
+        
+        docstring = node.body[0]
+        if (isinstance(docstring, ast.Expr) and isinstance(docstring.value, ast.Constant)
+                and isinstance(docstring.value.value, str)):
+            # A one-line `def f(): "doc"` keeps its def line
+            lines.difference_update(range(max(docstring.lineno, node.lineno + 1),
+                                          docstring.end_lineno + 1))
+        halstead = [len(distinct_operators), len(distinct_operands), operators, operands]
+        return loc, cc, attrs, references, halstead, len(lines)
+
+class ComplexityAnalyzer(MetricAnalyzer):
+    """MetricAnalyzer for gates on CC, LOC, DIT and NOC only
+    
+    Classes keep their methods and bases, but references, self-attributes and
+    Halstead counts are skipped, so its partial results are never cached.
+    """
+    cacheable = False
+    
+    def visit_Name(self, node):
+        pass
+    
+    def measure_method(self, node):
+        method_name = f"{self.current_class}.{node.name}"
+        self.current_method = method_name
+        self.classes[self.current_class]['methods'].append(node.name)
+        loc = 0
+        cc = 1
+        stack = [node]
+        while stack:
+            child = stack.pop()
+            if isinstance(child, ast.ClassDef):
+                self.current_method = None
+                self.visit(child)
+                self.current_method = method_name
+                continue
+            if isinstance(child, (ast.stmt, ast.expr)):
+                loc += 1
+            if isinstance(child, DECISION_NODES):
+                cc += decision_points(child)
+            stack.extend(ast.iter_child_nodes(child))
+        self.loc[method_name] = loc
+        self.complexity[method_name] = cc
         self.current_method = None
 
-def calculate_cbo(class_name: str, classes: Dict, source_code: str) -> int:
-    """Calculate Coupling Between Objects"""
-    coupling_count = 0
-    class_names = set(classes.keys())
-    
-    # Parse to find references to other classes
-    tree = ast.parse(source_code)
-    for node in ast.walk(tree):
-        if isinstance(node, ast.ClassDef) and node.name == class_name:
-            for child in ast.walk(node):
-                # Check for attribute access to other class instances
-                if isinstance(child, ast.Attribute):
-                    if isinstance(child.value, ast.Name):
-                        if child.value.id in class_names and child.value.id != class_name:
-                            coupling_count += 1
-                # Check for method calls on other classes
-                if isinstance(child, ast.Call):
-                    if isinstance(child.func, ast.Attribute):
-                        if isinstance(child.func.value, ast.Name):
-                            if child.func.value.id in class_names and child.func.value.id != class_name:
-                                coupling_count += 1
-    
-    return coupling_count
-
-def calculate_dit(class_name: str, classes: Dict) -> int:
-    """Calculate Depth of Inheritance Tree"""
-    if class_name not in classes or not classes[class_name]['bases']:
+def decision_points(node: ast.AST) -> int:
+    """CC added by one of DECISION_NODES"""
+    if isinstance(node, (ast.If, ast.IfExp)):
+        return 1
+    if isinstance(node, LOOP_NODES):
+        return 1 + bool(node.orelse)
+    if isinstance(node, TRY_NODES):
+        return len(node.handlers) + bool(node.orelse)
+    if isinstance(node, ast.BoolOp):
+        return len(node.values) - 1
+    if isinstance(node, ast.comprehension):
+        return 1 + len(node.ifs)
+    return int(not is_wildcard_case(node))  # ast.match_case
+
+def operand_key(node: ast.expr):
+    """Identity of a Halstead operand: a name, a constant, `name.attr`, or the node itself
+    
+    Other expressions are distinct operands wherever they appear, which is
+    far cheaper than comparing their structure.
+    """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Constant):
+        return (type(node.value), node.value)
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+        return (node.value.id, node.attr)
+    return id(node)
+
+def halstead_volume(distinct_operators: int, distinct_operands: int, operators: int,
+                    operands: int) -> float:
+    """Halstead volume: program length times log2 of the vocabulary"""
+    vocabulary = distinct_operators + distinct_operands
+    if vocabulary == 0:
+        return 0.0
+    return (operators + operands) * math.log2(vocabulary)
+
+def maintainability_index(volume: float, cc: int, lines: int) -> float:
+    """Maintainability Index scaled to 0-100, radon's formula without the comment term"""
+    if volume <= 0 or lines <= 0:
+        return 100.0
+    raw = 171 - 5.2 * math.log(volume) - 0.23 * cc - 16.2 * math.log(lines)
+    return round(min(max(0.0, raw * 100 / 171), 100.0), 2)
+
+def base_name(node: ast.expr) -> str:
+    """Dotted name of a base class expression, e.g. `models.Person`, or None"""
+    if isinstance(node, ast.Subscript):  # Generic[T], List[int]
+        node = node.value
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
+
+def is_wildcard_case(case: ast.match_case) -> bool:
+    """A bare `case _:` is the fall-through branch, not a decision point"""
+    pattern = case.pattern
+    return isinstance(pattern, ast.MatchAs) and pattern.pattern is None and case.guard is None
+
+def calculate_cbo(class_name: str, classes: Dict, *, class_names: Set[str] = None) -> int:
+    """Calculate Coupling Between Objects (distinct classes referenced)"""
+    if class_name not in classes:
         return 0
+    if class_names is None:
+        class_names = classes.keys()
+    
+    # References were collected during the MetricAnalyzer pass, so no re-parse.
+    # Merged reports key classes as "module.Class" but references are bare names.
+    own_name = class_name.rsplit('.', 1)[-1]
+    coupled = {ref for ref in classes[class_name]['references']
+               if ref in class_names and ref != own_name}
+    return len(coupled)
+
+def qualify(module: str, name: str) -> str:
+    return f"{module}.{name}" if module else name
+
+def absolute_import(target: str, module: str, is_package: bool) -> str:
+    """Resolve a relative import target like `..models.Person` against `module`"""
+    level = len(target) - len(target.lstrip('.'))
+    if not level:
+        return target
+    package = module.split('.') if module else []
+    if not is_package:
+        package = package[:-1]
+    package = package[:len(package) - (level - 1)]
+    return '.'.join(package + [target[level:]]) if target[level:] else '.'.join(package)
+
+def build_inheritance_graph(results: List[Dict]) -> Dict[str, List[str]]:
+    """Map every qualified class name to its bases, resolved across modules where possible
+    
+    Bases that resolve to an analyzed class use its qualified name; anything
+    else (builtins, third-party classes) keeps the dotted name from the source.
+    """
+    modules = {}
+    known = set()
+    for result in results:
+        module = result.get('module', '')
+        imports = {name: absolute_import(target, module, result.get('is_package', False))
+                   for name, target in result.get('imports', {}).items()}
+        modules[module] = (result['classes'], imports)
+        known.update(qualify(module, class_name) for class_name in result['classes'])
+    
+    def resolve(module, dotted, hops=0):
+        classes, imports = modules[module]
+        head, _, rest = dotted.partition('.')
+        if head in classes:
+            candidate = qualify(module, dotted)
+        elif head in imports:
+            candidate = f"{imports[head]}.{rest}" if rest else imports[head]
+        else:
+            return dotted
+        if candidate in known:
+            return candidate
+        # Follow re-exports, e.g. `from pkg import Person` where pkg/__init__ imports it
+        owner, _, name = candidate.rpartition('.')
+        if owner in modules and owner != module and hops < 16:
+            return resolve(owner, name, hops + 1)
+        return candidate
     
-    max_depth = 0
-    for base in classes[class_name]['bases']:
-        depth = 1 + calculate_dit(base, classes)
-        max_depth = max(max_depth, depth)
+    graph = {}
+    for module, (classes, _) in modules.items():
+        for class_name, info in classes.items():
+            graph[qualify(module, class_name)] = [resolve(module, base) for base in info['bases']]
+    return graph
+
+def compute_hierarchy(graph: Dict[str, List[str]]) -> Tuple[Dict, Dict, List[List[str]]]:
+    """DIT and NOC for every class in one topological pass, plus any inheritance cycles
+    
+    Bases outside the graph count as one level of depth. Classes in (or
+    inheriting from) a cycle have no well-defined depth and get DIT None.
+    """
+    children = {name: [] for name in graph}
+    pending = dict.fromkeys(graph, 0)  # Unprocessed analyzed bases per class
+    for name, bases in graph.items():
+        for base in set(bases):
+            if base in graph:
+                children[base].append(name)
+                pending[name] += 1
+    
+    dit = {}
+    ready = deque(name for name, count in pending.items() if count == 0)
+    while ready:
+        name = ready.popleft()
+        dit[name] = max((dit[base] + 1 if base in graph else 1 for base in graph[name]), default=0)
+        for child in children[name]:
+            pending[child] -= 1
+            if pending[child] == 0:
+                ready.append(child)
     
-    return max_depth
+    # Every class left over has an unprocessed base, so following those bases must loop
+    cycles = []
+    acyclic = set(dit)
+    seen = set()
+    for start in graph:
+        if start in acyclic or start in seen:
+            continue
+        path = []
+        position = {}
+        name = start
+        while name not in seen:
+            seen.add(name)
+            position[name] = len(path)
+            path.append(name)
+            name = next(base for base in graph[name] if base in graph and base not in acyclic)
+        if name in position:
+            cycles.append(path[position[name]:])
+        for name in path:
+            dit[name] = None
+    
+    noc = {name: len(kids) for name, kids in children.items()}
+    return dit, noc, cycles
 
-def calculate_lcom(class_name: str, classes: Dict, methods: Dict) -> float:
-    """Calculate Lack of Cohesion of Methods"""
+def calculate_lcom(class_name: str, classes: Dict) -> int:
+    """Calculate LCOM1: method pairs sharing no attribute minus pairs sharing one"""
     if class_name not in classes:
         return 0
     
-    method_list = classes[class_name]['methods']
-    if len(method_list) <= 1:
+    masks = list(classes[class_name]['method_masks'].values())
+    disjoint = shared = 0
+    for i, mask in enumerate(masks):
+        for other in masks[i + 1:]:
+            if mask & other:
+                shared += 1
+            else:
+                disjoint += 1
+    return max(disjoint - shared, 0)
+
+def calculate_lcom4(class_name: str, classes: Dict) -> int:
+    """Calculate LCOM4: connected groups of methods linked by shared attributes or calls"""
+    if class_name not in classes:
         return 0
     
-    # Get attributes accessed by each method
-    method_attrs = {}
-    for method in method_list:
-        method_attrs[method] = set()
-        # This is simplified - would need full AST analysis
-        # For now, return a placeholder
+    masks = classes[class_name]['method_masks']
+    parent = {method: method for method in masks}
+    
+    def find(method):
+        while parent[method] != method:
+            parent[method] = parent[parent[method]]
+            method = parent[method]
+        return method
+    
+    def union(a, b):
+        parent[find(a)] = find(b)
+    
+    # Link every method to the first method seen using each attribute bit
+    owner_of_bit = {}
+    for method, mask in masks.items():
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            if bit in owner_of_bit:
+                union(method, owner_of_bit[bit])
+            else:
+                owner_of_bit[bit] = method
+    for method, calls in classes[class_name]['method_calls'].items():
+        for callee in calls:
+            if callee in parent:
+                union(method, callee)
+    
+    return len({find(method) for method in parent})
+
+def summarize(analyzer: MetricAnalyzer) -> Dict:
+    """Compact, picklable per-file result (plain lists and dicts only)"""
+    classes = {}
+    for class_name, info in analyzer.classes.items():
+        classes[class_name] = {
+            'methods': info['methods'],
+            'bases': info['bases'],
+            'attributes': sorted(info['attributes']),
+            'references': sorted(info['references']),
+            'method_masks': info['method_masks'],
+            'method_calls': info['method_calls']
+        }
+    return {'classes': classes, 'complexity': analyzer.complexity, 'loc': analyzer.loc,
+            'halstead': analyzer.halstead, 'mi': analyzer.mi, 'imports': analyzer.imports}
+
+def module_name(path: str, root: str) -> str:
+    """Dotted module name of `path` relative to `root`"""
+    relative = os.path.splitext(os.path.relpath(path, root))[0]
+    parts = relative.split(os.sep)
+    if parts[-1] == '__init__' and len(parts) > 1:
+        parts.pop()
+    return '.'.join(parts)
+
+def analyze_source(source: bytes, filename: str = '<unknown>',
+                   analyzer_class: type = MetricAnalyzer) -> Dict:
+    """Parse source and return its per-file summary; raises SyntaxError/ValueError"""
+    analyzer = analyzer_class()
+    analyzer.visit(ast.parse(source, filename=filename))
+    return summarize(analyzer)
+
+def analyze_source_file(path: str, root: str, cache: ResultCache = None,
+                        profile: bool = False, analyzer_class: type = MetricAnalyzer) -> Dict:
+    """Analyze one file and return its summary, or the error that stopped it
+    
+    Names are qualified by module relative to `root`; pass None for bare names.
+    With `profile` the result carries a `profile` record of read/parse/visit
+    times, source size and AST node count. Cached summaries are reused whatever
+    the `analyzer_class`, but only cacheable analyzers store new ones.
+    """
+    result = {'path': path, 'module': module_name(path, root) if root else '',
+              'is_package': os.path.basename(path) == '__init__.py'}
+    timings = {'path': path}
+    if profile:
+        result['profile'] = timings
+    try:
+        start = time.perf_counter()
+        with open(path, 'rb') as f:
+            source = f.read()
+        timings['read'] = time.perf_counter() - start
+        timings['bytes'] = len(source)
+        if cache is not None:
+            result['digest'] = cache.digest(source)
+            summary = cache.load(result['digest'])
+            if summary is not None:
+                timings['cached'] = 1
+                result.update(summary)
+                return result
+        if not profile:
+            summary = analyze_source(source, path, analyzer_class)
+        else:
+            start = time.perf_counter()
+            tree = ast.parse(source, filename=path)
+            timings['parse'] = time.perf_counter() - start
+            timings['nodes'] = sum(1 for _ in ast.walk(tree))
+            start = time.perf_counter()
+            analyzer = analyzer_class()
+            analyzer.visit(tree)
+            summary = summarize(analyzer)
+            timings['visit'] = time.perf_counter() - start
+    except (OSError, SyntaxError, UnicodeDecodeError, ValueError) as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        return result
+    
+    if cache is not None and analyzer_class.cacheable:
+        cache.store(result['digest'], summary)
+    else:
+        result.pop('digest', None)
+    result.update(summary)
+    return result
+
+def analyze_chunk(paths: List[str], root: str, cache_dir: str = None,
+                  profile: bool = False, analyzer_class: type = MetricAnalyzer) -> List[Dict]:
+    """Worker entry point: analyze a batch of files"""
+    cache = ResultCache(cache_dir, ANALYZER_VERSION) if cache_dir else None
+    return [analyze_source_file(path, root, cache, profile, analyzer_class) for path in paths]
+
+def merge_results(results: List[Dict]) -> Dict:
+    """Combine per-file summaries into one project-wide result"""
+    merged = {'classes': {}, 'complexity': {}, 'loc': {}, 'halstead': {}, 'mi': {}, 'errors': {}}
+    analyzed = []
+    for result in sorted(results, key=lambda r: r['path']):
+        if 'error' in result:
+            merged['errors'][result['path']] = result['error']
+            continue
+        
+        analyzed.append(result)
+        prefix = result['module'] + '.'
+        for class_name, info in result['classes'].items():
+            merged['classes'][prefix + class_name] = info
+        for method, cc in result['complexity'].items():
+            merged['complexity'][prefix + method] = cc
+        for method, loc in result['loc'].items():
+            merged['loc'][prefix + method] = loc
+        for method, counts in result['halstead'].items():
+            merged['halstead'][prefix + method] = counts
+            merged['mi'][prefix + method] = result['mi'][method]
+    
+    merged['dit'], merged['noc'], merged['cycles'] = compute_hierarchy(build_inheritance_graph(analyzed))
+    return merged
+
+def iter_directory_results(root: str, workers: int = None, chunk_size: int = 64,
+                           cache: ResultCache = None, profiler: Profiler = None,
+                           analyzer_class: type = MetricAnalyzer) -> Iterator[Dict]:
+    """Yield per-file summaries for every Python file under `root` as they complete"""
+    profile = profiler is not None
+    pending = []
+    for path in find_python_files(root):
+        # Files whose mtime and size match the cache index are never read
+        digest = cache.known_digest(path) if cache is not None else None
+        summary = cache.load(digest) if digest else None
+        if summary is None:
+            pending.append(path)
+        else:
+            if profile:
+                profiler.add_file({'path': path, 'cached': 1})
+            yield {'path': path, 'module': module_name(path, root),
+                   'is_package': os.path.basename(path) == '__init__.py',
+                   'digest': digest, **summary}
+    
+    chunks = iter([pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)])
+    workers = workers or os.cpu_count() or 1
+    cache_dir = cache.directory if cache is not None else None
+    digests = {}
+    if workers == 1 or len(pending) <= chunk_size:
+        # One file at a time, so a consumer that stops early stops the work too
+        completed = ([analyze_source_file(path, root, cache, profile, analyzer_class)]
+                     for path in pending)
+    else:
+        completed = run_chunks(chunks, root, cache_dir, workers, profile, analyzer_class)
+    for chunk_results in completed:
+        for result in chunk_results:
+            if profile:
+                profiler.add_file(result.pop('profile'))
+            if 'digest' in result:
+                digests[result['path']] = result['digest']
+            yield result
+    
+    if cache is not None:
+        for path, digest in digests.items():
+            cache.remember(path, digest)
+        cache.save()
+
+def run_chunks(chunks: Iterator[List[str]], root: str, cache_dir: str, workers: int,
+               profile: bool = False, analyzer_class: type = MetricAnalyzer) -> Iterator[List[Dict]]:
+    """Run chunks on a process pool, keeping only a few in flight so results never pile up
     
-    # LCOM = 1 - (average cohesion)
-    # Simplified calculation
-    return 0.5  # Placeholder - would need full implementation
+    A consumer that stops early (e.g. a fail-fast gate) terminates the pool,
+    chunks already running included.
+    """
+    completed = queue.SimpleQueue()  # (chunk results, error) from the pool's callbacks
+    pool = multiprocessing.Pool(workers)
+    finished = False
+    try:
+        def submit(chunk):
+            pool.apply_async(analyze_chunk, (chunk, root, cache_dir, profile, analyzer_class),
+                             callback=lambda results: completed.put((results, None)),
+                             error_callback=lambda error: completed.put((None, error)))
+        
+        in_flight = 0
+        for chunk in islice(chunks, workers * 2):
+            submit(chunk)
+            in_flight += 1
+        while in_flight:
+            results, error = completed.get()
+            in_flight -= 1
+            if error is not None:
+                raise error
+            chunk = next(chunks, None)
+            if chunk is not None:
+                submit(chunk)
+                in_flight += 1
+            yield results
+        finished = True
+    finally:
+        if finished:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
+
+def analyze_directory(root: str, workers: int = None, chunk_size: int = 64,
+                      cache: ResultCache = None, profiler: Profiler = None) -> Dict:
+    """Analyze every Python file under `root` across a pool of processes"""
+    with maybe_phase(profiler, 'files'):
+        results = list(iter_directory_results(root, workers, chunk_size, cache, profiler))
+    with maybe_phase(profiler, 'merge'):
+        return merge_results(results)
+
+def iter_path_results(path: str, workers: int = None, chunk_size: int = 64,
+                      cache: ResultCache = None, profiler: Profiler = None,
+                      analyzer_class: type = MetricAnalyzer) -> Iterator[Dict]:
+    """Per-file summaries for a directory tree, or for a single file with bare names"""
+    if os.path.isdir(path):
+        yield from iter_directory_results(path, workers, chunk_size, cache, profiler,
+                                          analyzer_class)
+        return
+    result = analyze_source_file(path, None, profile=profiler is not None,
+                                 analyzer_class=analyzer_class)
+    if profiler is not None:
+        profiler.add_file(result.pop('profile'))
+    yield result
 
-def analyze_file(filename: str):
-    """Main analysis function"""
-    with open(filename, 'r', encoding='utf-8') as f:
-        source_code = f.read()
+class MetricWriter:
+    """Buffered writer emitting one JSON Lines or CSV record per method or class"""
     
-    tree = ast.parse(source_code)
-    analyzer = MetricAnalyzer()
-    analyzer.visit(tree)
+    FIELDS = ['kind', 'file', 'name', 'cc', 'loc', 'volume', 'mi', 'cbo', 'dit', 'noc', 'lcom1',
+              'lcom4']
+    
+    def __init__(self, stream: TextIO, output_format: str = 'jsonl'):
+        if output_format not in ('jsonl', 'csv'):
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self._stream = stream
+        self._format = output_format
+        self._csv = None
+        if output_format == 'csv':
+            self._csv = csv.DictWriter(stream, fieldnames=self.FIELDS, lineterminator='\n')
+            self._csv.writeheader()
+
+    def write(self, record: Dict) -> None:
+        if self._csv is not None:
+            self._csv.writerow(record)
+        else:
+            self._stream.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def write_method(self, path: str, name: str, cc: int, loc: int, volume: float = None,
+                     mi: float = None) -> None:
+        self.write({'kind': 'method', 'file': path, 'name': name, 'cc': cc, 'loc': loc,
+                    'volume': volume, 'mi': mi})
+
+    def write_class(self, path: str, name: str, cbo: int, dit: int, noc: int,
+                    lcom1: int, lcom4: int) -> None:
+        self.write({'kind': 'class', 'file': path, 'name': name, 'cbo': cbo, 'dit': dit,
+                    'noc': noc, 'lcom1': lcom1, 'lcom4': lcom4})
+
+    def flush(self) -> None:
+        self._stream.flush()
+
+def stream_path(path: str, writer: MetricWriter, workers: int = None, chunk_size: int = 64,
+                cache: ResultCache = None, profiler: Profiler = None,
+                memory_limit: int = None) -> Dict[str, str]:
+    """Write method records as each file finishes, then class records once all classes are known
     
+    CBO, DIT and NOC need the whole project, so each class is kept as a
+    compact ClassRecord plus its bases; everything else about a file is
+    dropped as soon as its method records are written. Past `memory_limit`
+    bytes the class records spill to a temporary file; the bases, imports
+    and interned names used for the hierarchy stay in memory. Returns the
+    files that could not be analyzed.
+    """
+    results = iter_path_results(path, workers, chunk_size, cache, profiler)
+    errors = {}
+    strings = StringTable()
+    spool = RecordSpool(memory_limit)
+    class_ids = set()
+    hierarchy = []  # Only bases and imports, for build_inheritance_graph
+    try:
+        for result in results:
+            if 'error' in result:
+                errors[result['path']] = result['error']
+                continue
+            module, classes = result['module'], result['classes']
+            for method, cc in result['complexity'].items():
+                writer.write_method(result['path'], qualify(module, method), cc,
+                                    result['loc'][method],
+                                    round(halstead_volume(*result['halstead'][method]), 2),
+                                    result['mi'][method])
+            writer.flush()  # Let consumers see each file as soon as it is done
+            for class_name, info in classes.items():
+                class_ids.add(strings.intern(class_name))
+                spool.append(ClassRecord.from_summary(
+                    strings, result['path'], qualify(module, class_name), class_name, info,
+                    calculate_lcom(class_name, classes), calculate_lcom4(class_name, classes)))
+            hierarchy.append({'module': module, 'is_package': result['is_package'],
+                              'imports': result['imports'],
+                              'classes': {name: {'bases': info['bases']}
+                                          for name, info in classes.items()}})
+        
+        with maybe_phase(profiler, 'hierarchy'):
+            dit, noc, _ = compute_hierarchy(build_inheritance_graph(hierarchy))
+        del hierarchy
+        with maybe_phase(profiler, 'class_metrics'):
+            for record in spool:
+                writer.write_class(record.file, record.name, record.cbo(class_ids),
+                                   dit[record.name], noc[record.name], record.lcom1, record.lcom4)
+            writer.flush()
+    finally:
+        spool.close()
+    return errors
+
+def print_report(complexity: Dict, loc: Dict, classes: Dict, dit: Dict, noc: Dict,
+                 cycles: List[List[str]], profiler: Profiler = None, halstead: Dict = None,
+                 mi: Dict = None) -> None:
+    """Print the fixed-width text report; Halstead/MI get a section when given"""
+    with maybe_phase(profiler, 'class_metrics'):
+        class_names = {name.rsplit('.', 1)[-1] for name in classes}
+        cbo = {name: calculate_cbo(name, classes, class_names=class_names) for name in classes}
+        lcom = {name: (calculate_lcom(name, classes), calculate_lcom4(name, classes))
+                for name in classes}
+    with maybe_phase(profiler, 'report'):
+        print_sections(complexity, loc, classes, dit, noc, cycles, cbo, lcom)
+        if halstead is not None:
+            print_maintainability(halstead, mi)
+
+def print_sections(complexity: Dict, loc: Dict, classes: Dict, dit: Dict, noc: Dict,
+                   cycles: List[List[str]], cbo: Dict[str, int],
+                   lcom: Dict[str, Tuple[int, int]]) -> None:
     print("=" * 60)
     print("METRIC ANALYSIS REPORT")
     print("=" * 60)
     
     print("\n1. CYCLOMATIC COMPLEXITY (CC) by Method:")
     print("-" * 60)
-    for method, cc in sorted(analyzer.complexity.items(), key=lambda x: x[1], reverse=True):
+    for method, cc in sorted(complexity.items(), key=lambda x: x[1], reverse=True):
         print(f"  {method:40s} CC: {cc}")
     
     print("\n2. LINES OF CODE (LOC) by Method:")
     print("-" * 60)
-    for method, loc in sorted(analyzer.loc.items(), key=lambda x: x[1], reverse=True):
-        print(f"  {method:40s} LOC: {loc}")
+    for method, method_loc in sorted(loc.items(), key=lambda x: x[1], reverse=True):
+        print(f"  {method:40s} LOC: {method_loc}")
     
-    print("\n3. DEPTH OF INHERITANCE TREE (DIT):")
+    print("\n3. DEPTH OF INHERITANCE TREE (DIT) and NUMBER OF CHILDREN (NOC):")
     print("-" * 60)
-    for class_name in analyzer.classes:
-        dit = calculate_dit(class_name, analyzer.classes)
-        print(f"  {class_name:40s} DIT: {dit}")
+    for class_name in classes:
+        depth = 'cycle' if dit[class_name] is None else dit[class_name]
+        print(f"  {class_name:40s} DIT: {depth}  NOC: {noc[class_name]}")
+    for cycle in cycles:
+        print(f"  Inheritance cycle: {' -> '.join(cycle + cycle[:1])}")
     
     print("\n4. COUPLING BETWEEN OBJECTS (CBO):")
     print("-" * 60)
-    for class_name in analyzer.classes:
-        cbo = calculate_cbo(class_name, analyzer.classes, source_code)
-        print(f"  {class_name:40s} CBO: {cbo}")
+    for class_name in classes:
+        print(f"  {class_name:40s} CBO: {cbo[class_name]}")
     
     print("\n5. LACK OF COHESION OF METHODS (LCOM):")
     print("-" * 60)
-    print("  (Note: Full LCOM calculation requires detailed attribute tracking)")
-    for class_name in analyzer.classes:
-        lcom = calculate_lcom(class_name, analyzer.classes, analyzer.methods)
-        print(f"  {class_name:40s} LCOM: {lcom:.2f} (estimated)")
+    for class_name in classes:
+        lcom1, lcom4 = lcom[class_name]
+        print(f"  {class_name:40s} LCOM1: {lcom1}  LCOM4: {lcom4}")
+
+def print_maintainability(halstead: Dict, mi: Dict) -> None:
+    print("\n6. HALSTEAD VOLUME (V) and MAINTAINABILITY INDEX (MI) by Method:")
+    print("-" * 60)
+    for method, index in sorted(mi.items(), key=lambda x: x[1]):
+        volume = halstead_volume(*halstead[method])
+        print(f"  {method:40s} V: {volume:.1f}  MI: {index:.1f}")
+
+def analyze_file(filename: str, profiler: Profiler = None):
+    """Main analysis function
+    
+    With a `profiler`, each phase (read, parse, visit, hierarchy,
+    class_metrics, report) is timed and the file's record is added.
+    """
+    with maybe_phase(profiler, 'read') as read:
+        with open(filename, 'r', encoding='utf-8') as f:
+            source_code = f.read()
+    
+    with maybe_phase(profiler, 'parse') as parse:
+        tree = ast.parse(source_code)
+    with maybe_phase(profiler, 'visit') as visit:
+        analyzer = MetricAnalyzer()
+        analyzer.visit(tree)
+    if profiler is not None:
+        profiler.add_file({'path': filename, 'bytes': len(source_code.encode('utf-8')),
+                           'nodes': sum(1 for _ in ast.walk(tree)), 'read': read['wall'],
+                           'parse': parse['wall'], 'visit': visit['wall']})
+    
+    with maybe_phase(profiler, 'hierarchy'):
+        graph = build_inheritance_graph([{'classes': analyzer.classes,
+                                          'imports': analyzer.imports}])
+        dit, noc, cycles = compute_hierarchy(graph)
+    print_report(analyzer.complexity, analyzer.loc, analyzer.classes, dit, noc, cycles, profiler,
+                 analyzer.halstead, analyzer.mi)
     
     return analyzer
 
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        analyze_file(sys.argv[1])
+def analyze_path(path: str, workers: int = None, chunk_size: int = 64,
+                 cache: ResultCache = None, profiler: Profiler = None):
+    """Analyze a single file, or a whole directory tree in parallel"""
+    if not os.path.isdir(path):
+        return analyze_file(path, profiler)
+    
+    merged = analyze_directory(path, workers, chunk_size, cache, profiler)
+    print_report(merged['complexity'], merged['loc'], merged['classes'], merged['dit'],
+                 merged['noc'], merged['cycles'], profiler, merged['halstead'], merged['mi'])
+    if merged['errors']:
+        print(f"\nSkipped {len(merged['errors'])} file(s) that could not be analyzed:")
+        for path, error in merged['errors'].items():
+            print(f"  {path}: {error}")
+    return merged
+
+def parse_thresholds(spec: str) -> Dict[str, int]:
+    """Parse a gate spec like `cc=10,cbo=8` into metric limits"""
+    thresholds = {}
+    for item in spec.split(','):
+        metric, _, limit = item.strip().partition('=')
+        metric = metric.lower()
+        if metric not in GATE_METRICS or not limit.strip().isdigit():
+            raise argparse.ArgumentTypeError(
+                f"expected metric=limit with metric in {', '.join(GATE_METRICS)}, got '{item}'")
+        thresholds[metric] = int(limit)
+    return thresholds
+
+def run_gate(path: str, thresholds: Dict[str, int], fail_fast: bool = False,
+             workers: int = None, chunk_size: int = 64, cache: ResultCache = None,
+             profiler: Profiler = None) -> List[Dict]:
+    """Check metrics against `thresholds`, computing only what they need
+    
+    A violation is a value strictly above its limit. With `fail_fast` the
+    run stops at the first violation found, abandoning work in progress, and
+    workers take at most FAIL_FAST_CHUNK files at a time. Gates on
+    COMPLEXITY_METRICS alone skip references, cohesion and Halstead counts.
+    """
+    if fail_fast:
+        chunk_size = min(chunk_size, FAIL_FAST_CHUNK)
+    lite = thresholds.keys() <= COMPLEXITY_METRICS
+    results = iter_path_results(path, workers, chunk_size, cache, profiler,
+                                ComplexityAnalyzer if lite else MetricAnalyzer)
+    violations = []
+    reported = set()
+    
+    def violate(metric, file, name, value):
+        """Record a violation; True when the gate should stop"""
+        if value is not None and value > thresholds[metric] and (metric, name) not in reported:
+            reported.add((metric, name))
+            violations.append({'metric': metric, 'file': file, 'name': name, 'value': value,
+                               'limit': thresholds[metric]})
+            return fail_fast
+        return False
+    
+    needs_project = bool(thresholds.keys() & {'cbo', 'dit', 'noc'})
+    class_names = set()
+    class_results = []
+    for result in results:
+        if 'error' in result:
+            print(f"Skipped {result['path']}: {result['error']}", file=sys.stderr)
+            continue
+        module, classes, file = result['module'], result['classes'], result['path']
+        if 'cc' in thresholds:
+            for method, cc in result['complexity'].items():
+                if violate('cc', file, qualify(module, method), cc):
+                    return violations
+        if 'loc' in thresholds:
+            for method, loc in result['loc'].items():
+                if violate('loc', file, qualify(module, method), loc):
+                    return violations
+        for metric, calculate in (('lcom1', calculate_lcom), ('lcom4', calculate_lcom4)):
+            if metric in thresholds:
+                for class_name in classes:
+                    if violate(metric, file, qualify(module, class_name),
+                               calculate(class_name, classes)):
+                        return violations
+        if needs_project:
+            class_names.update(classes)
+            class_results.append({key: result[key] for key in
+                                  ('path', 'module', 'is_package', 'classes', 'imports')})
+            if 'cbo' in thresholds and fail_fast:
+                # CBO only grows as more class names are seen, so this is a lower bound
+                for class_name in classes:
+                    if violate('cbo', file, qualify(module, class_name),
+                               calculate_cbo(class_name, classes, class_names=class_names)):
+                        return violations
+    
+    for result in class_results if 'cbo' in thresholds else ():
+        for class_name in result['classes']:
+            if violate('cbo', result['path'], qualify(result['module'], class_name),
+                       calculate_cbo(class_name, result['classes'], class_names=class_names)):
+                return violations
+    if thresholds.keys() & {'dit', 'noc'}:
+        dit, noc, _ = compute_hierarchy(build_inheritance_graph(class_results))
+        for result in class_results:
+            for class_name in result['classes']:
+                name = qualify(result['module'], class_name)
+                if 'dit' in thresholds and violate('dit', result['path'], name, dit[name]):
+                    return violations
+                if 'noc' in thresholds and violate('noc', result['path'], name, noc[name]):
+                    return violations
+    return violations
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Calculate CC, LOC, CBO, DIT and LCOM")
+    parser.add_argument("path", help="Python file, or directory to analyze recursively")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for directories (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=64,
+                        help="files handed to a worker at a time (default: 64)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="reuse results for unchanged files across runs of a directory")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="cache size limit in MB before old entries are evicted (default: 256)")
+    parser.add_argument("--format", choices=("text", "jsonl", "csv", "npz"), default="text",
+                        help="text report, one JSON Lines/CSV record per method and class, "
+                             "or a columnar .npz snapshot (needs --output and NumPy)")
+    parser.add_argument("--output", default=None,
+                        help="write jsonl/csv records or the npz snapshot to this file")
+    parser.add_argument("--gate", type=parse_thresholds, default=None, metavar="METRIC=LIMIT,...",
+                        help="CI gate: exit 1 if any value exceeds its limit, e.g. cc=10,cbo=8")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="with --gate, stop at the first violation")
+    parser.add_argument("--memory-limit", type=int, default=None, metavar="MB",
+                        help="for jsonl/csv, spill class records to disk past this size; the "
+                             "class hierarchy stays in memory, and npz ignores this option "
+                             "since the snapshot holds every row anyway")
+    parser.add_argument("--profile", default=None, metavar="FILE",
+                        help="write phase timings, slowest files and peak memory as JSON")
+    args = parser.parse_args(argv)
+    
+    profiler = Profiler() if args.profile else None
+    try:
+        with maybe_phase(profiler, 'total'):
+            return run(args, parser, profiler)
+    finally:
+        if profiler is not None:
+            profiler.dump(args.profile)
+
+def run(args: argparse.Namespace, parser: argparse.ArgumentParser,
+        profiler: Profiler = None) -> int:
+    """Dispatch the parsed command line to the gate, report or record writers"""
+    cache = None
+    if args.cache_dir:
+        cache = ResultCache(args.cache_dir, ANALYZER_VERSION, args.cache_size * 1024 * 1024)
+    memory_limit = args.memory_limit * 1024 * 1024 if args.memory_limit else None
+    if args.gate:
+        violations = run_gate(args.path, args.gate, args.fail_fast, args.workers,
+                              args.chunk_size, cache, profiler)
+        for violation in violations:
+            print(f"{violation['file']}: {violation['name']} {violation['metric'].upper()} "
+                  f"{violation['value']} > {violation['limit']}")
+        return 1 if violations else 0
+    if args.format == "text":
+        analyze_path(args.path, args.workers, args.chunk_size, cache, profiler)
+        return 0
+    if args.format == "npz":
+        if not args.output:
+            parser.error("--format npz needs --output")
+        if np is None:  # Checked before the analysis, not when saving its result
+            parser.error("--format npz needs NumPy")
+        store = MetricStore()  # Holds every row, so spilling class records would save nothing
+        errors = stream_path(args.path, store, args.workers, args.chunk_size, cache, profiler)
+        store.save(args.output)
+        for path, error in errors.items():
+            print(f"Skipped {path}: {error}", file=sys.stderr)
+        return 0
+    
+    if args.output:
+        stream = open(args.output, 'w', encoding='utf-8', newline='', buffering=OUTPUT_BUFFER)
     else:
-        print("Usage: python metric_analyzer.py <filename>")
+        stream = sys.stdout
+    try:
+        errors = stream_path(args.path, MetricWriter(stream, args.format), args.workers,
+                             args.chunk_size, cache, profiler, memory_limit)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    for path, error in errors.items():
+        print(f"Skipped {path}: {error}", file=sys.stderr)
+    return 0
 
+if __name__ == "__main__":
+    sys.exit(main())
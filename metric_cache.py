@@ -0,0 +1,145 @@
+"""
+On-disk result cache for the Metric Analysis Tool
+Per-file summaries are stored under a hash of the analyzer version and the
+file content, and an index of (mtime, size) lets unchanged files be skipped
+without even reading them
+"""
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, Optional
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+INDEX_FILE = "index.json"
+ENTRY_DIR = "entries"
+
+
+class ResultCache:
+    """Content-addressed store of per-file metric summaries"""
+    
+    def __init__(self, directory: str, version: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self._directory = directory
+        self._version = version
+        self._max_bytes = max_bytes
+        self._index: Optional[Dict[str, list]] = None  # Loaded on first use
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def digest(self, source: bytes) -> str:
+        """Key for a file's content under the current analyzer version"""
+        hasher = hashlib.sha256(self._version.encode())
+        hasher.update(b"\0")
+        hasher.update(source)
+        return hasher.hexdigest()
+
+    def _entry_path(self, digest: str) -> str:
+        return os.path.join(self._directory, ENTRY_DIR, digest[:2], digest + ".json")
+
+    def _load_index(self) -> Dict[str, list]:
+        if self._index is None:
+            self._index = {}
+            try:
+                with open(os.path.join(self._directory, INDEX_FILE), encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == self._version:
+                    self._index = data["files"]
+            except (OSError, ValueError, KeyError):
+                pass  # Missing or corrupt index only costs re-hashing
+        return self._index
+
+    def known_digest(self, path: str) -> Optional[str]:
+        """Digest recorded for `path`, if its mtime and size are unchanged"""
+        entry = self._load_index().get(os.path.abspath(path))
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+        return None
+
+    def remember(self, path: str, digest: str) -> None:
+        """Record the digest of `path` against its current mtime and size"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        self._load_index()[os.path.abspath(path)] = [stat.st_mtime_ns, stat.st_size, digest]
+
+    def load(self, digest: str) -> Optional[Dict]:
+        """Cached summary for `digest`, or None on a miss"""
+        entry_path = self._entry_path(digest)
+        try:
+            with open(entry_path, encoding="utf-8") as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(entry_path)  # Mark as recently used for eviction
+        except OSError:
+            pass
+        self.hits += 1
+        return summary
+
+    def store(self, digest: str, summary: Dict) -> None:
+        """Write a summary atomically so concurrent workers never see partial entries"""
+        entry_path = self._entry_path(digest)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(summary, f, separators=(",", ":"))
+            os.replace(temp_path, entry_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def save(self) -> None:
+        """Persist the index and evict entries beyond the size limit"""
+        os.makedirs(self._directory, exist_ok=True)
+        index_path = os.path.join(self._directory, INDEX_FILE)
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": self._version, "files": self._load_index()}, f,
+                      separators=(",", ":"))
+        os.replace(index_path + ".tmp", index_path)
+        self.evict()
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache fits; returns count removed"""
+        entries = []
+        total = 0
+        root = os.path.join(self._directory, ENTRY_DIR)
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= self._max_bytes:
+            return 0
+        
+        # Trim to 90% so the next few runs don't evict again straight away
+        target = self._max_bytes * 0.9
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
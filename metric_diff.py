@@ -0,0 +1,293 @@
+"""
+Diff-scoped analysis for the Metric Analysis Tool
+Reads a unified diff, maps its changed lines to the enclosing methods and
+classes, and measures only those, before and after the change. Both sides
+are read from the git object database by the blob ids on the diff's `index`
+lines; a post-image not stored there (plain `git diff`) comes from the
+working tree. CBO only counts classes defined in the same file, and DIT/NOC
+are left out since they need the whole project.
+"""
+import argparse
+import ast
+import bisect
+import io
+import json
+import os
+import re
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from metric_analyzer import (
+    MetricAnalyzer, calculate_cbo, calculate_lcom, calculate_lcom4, halstead_volume, qualify
+)
+from metric_history import GitRepository
+
+HUNK_HEADER = re.compile(r'@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+METHOD_FIELDS = ('cc', 'loc', 'volume', 'mi')
+CLASS_FIELDS = ('cbo', 'lcom1', 'lcom4')
+
+
+def diff_path(path: str) -> Optional[str]:
+    """Repository path from a `---`/`+++` header, or None for /dev/null"""
+    path = path.split('\t', 1)[0].strip()
+    if path == '/dev/null':
+        return None
+    if path.startswith(('a/', 'b/')):
+        path = path[2:]
+    return path
+
+
+def parse_unified_diff(lines: Iterable[str]) -> List[Dict]:
+    """Changed files in a unified diff, with the changed line numbers on each side
+
+    Each entry has old_path/new_path (None when the file was added or
+    deleted), the blob ids from a git `index` line if present, and the sets
+    old_lines (removed) and new_lines (added).
+    """
+    changes = []
+    current = None
+    blobs = (None, None)
+    old_path = None
+    old_line = new_line = old_left = new_left = 0
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if old_left > 0 or new_left > 0:
+            tag = line[:1]
+            if tag == '\\':  # "\ No newline at end of file"
+                continue
+            if tag == '-':
+                current['old_lines'].add(old_line)
+                old_line += 1
+                old_left -= 1
+            elif tag == '+':
+                current['new_lines'].add(new_line)
+                new_line += 1
+                new_left -= 1
+            else:
+                old_line += 1
+                new_line += 1
+                old_left -= 1
+                new_left -= 1
+            continue
+
+        if line.startswith('diff --git '):
+            blobs = (None, None)
+        elif line.startswith('index '):
+            # All-zero ids stand for a side that doesn't exist
+            blobs = tuple(blob if blob.strip('0') else None
+                          for blob in line.split()[1].split('..', 1))
+        elif line.startswith('--- '):
+            old_path = diff_path(line[4:])
+        elif line.startswith('+++ '):
+            current = {'old_path': old_path, 'new_path': diff_path(line[4:]),
+                       'old_blob': blobs[0], 'new_blob': blobs[1],
+                       'old_lines': set(), 'new_lines': set()}
+            changes.append(current)
+            blobs = (None, None)
+        elif line.startswith('@@') and current is not None:
+            match = HUNK_HEADER.match(line)
+            if match:
+                old_line, new_line = int(match.group(1)), int(match.group(3))
+                old_left = int(match.group(2)) if match.group(2) is not None else 1
+                new_left = int(match.group(4)) if match.group(4) is not None else 1
+    return changes
+
+
+def touches(node: ast.AST, lines: List[int]) -> bool:
+    """Whether any of the sorted `lines` falls within the node, decorators included"""
+    start = node.lineno
+    for decorator in getattr(node, 'decorator_list', ()):
+        start = min(start, decorator.lineno)
+    i = bisect.bisect_left(lines, start)
+    return i < len(lines) and lines[i] <= node.end_lineno
+
+
+def touched_names(tree: ast.Module, lines: List[int]) -> Set[str]:
+    """Names of the classes and methods (`Class.method`) enclosing any of `lines`
+
+    Named as MetricAnalyzer names them; subtrees without a changed line are
+    never entered.
+    """
+    names = set()
+
+    def walk(nodes, class_name, enclosing):
+        # `class_name` is set directly in a class body; `enclosing` also inside its methods
+        for node in nodes:
+            if hasattr(node, 'lineno') and not touches(node, lines):
+                continue
+            if isinstance(node, ast.ClassDef):
+                qualified = qualify(enclosing, node.name)
+                names.add(qualified)
+                walk(node.body, qualified, qualified)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                if class_name:
+                    names.add(f"{class_name}.{node.name}")
+                walk(node.body, None, enclosing)  # Closures belong to the method
+            else:
+                walk([child for child in ast.iter_child_nodes(node)
+                      if isinstance(child, (ast.stmt, ast.excepthandler, ast.match_case))],
+                     class_name, enclosing)
+
+    if lines:
+        walk(tree.body, None, None)
+    return names
+
+
+class ScopedAnalyzer(MetricAnalyzer):
+    """MetricAnalyzer that only visits the named classes and statements holding changed lines
+
+    Named classes are visited whole, since LCOM needs all of their methods.
+    """
+
+    def __init__(self, lines: List[int], names: Set[str]):
+        super().__init__()
+        self._lines = lines
+        self._names = names
+
+    def visit_Module(self, node):
+        for stmt in node.body:
+            if isinstance(stmt, ast.ClassDef) or touches(stmt, self._lines):
+                self.visit(stmt)
+
+    def visit_ClassDef(self, node):
+        if qualify(self.current_class, node.name) in self._names:
+            super().visit_ClassDef(node)
+
+
+def scoped_metrics(tree: ast.Module, lines: List[int], names: Set[str]) -> Dict[str, Dict]:
+    """Metrics for the methods and classes in `names` that exist in `tree`"""
+    analyzer = ScopedAnalyzer(lines, names)
+    analyzer.visit(tree)
+    class_names = {node.name for node in tree.body if isinstance(node, ast.ClassDef)}
+    class_names.update(analyzer.classes)
+    metrics = {}
+    for method, cc in analyzer.complexity.items():
+        if method in names:
+            metrics[method] = {'cc': cc, 'loc': analyzer.loc[method],
+                               'volume': round(halstead_volume(*analyzer.halstead[method]), 2),
+                               'mi': analyzer.mi[method]}
+    for class_name in analyzer.classes:
+        if class_name in names:
+            metrics[class_name] = {'cbo': calculate_cbo(class_name, analyzer.classes,
+                                                         class_names=class_names),
+                                   'lcom1': calculate_lcom(class_name, analyzer.classes),
+                                   'lcom4': calculate_lcom4(class_name, analyzer.classes)}
+    return metrics
+
+
+def delta(before: Optional[Dict], after: Optional[Dict]) -> Optional[Dict]:
+    if before is None or after is None:
+        return None
+    return {key: round(after[key] - before[key], 2) for key in after}
+
+
+def read_sources(change: Dict, repo: GitRepository, repo_path: str, base: str = None):
+    """(old source, new source) for a change; None for a side that doesn't exist or can't be read"""
+    old_source = new_source = None
+    if change['old_path'] is not None:
+        name = change['old_blob'] or (f"{base}:{change['old_path']}" if base else None)
+        if name:
+            try:
+                old_source = repo.read_blob(name)
+            except ValueError:
+                pass
+    if change['new_path'] is not None:
+        if change['new_blob']:
+            try:
+                new_source = repo.read_blob(change['new_blob'])
+            except ValueError:
+                pass  # Not committed or staged: the diff is against the working tree
+        if new_source is None:
+            try:
+                with open(os.path.join(repo_path, change['new_path']), 'rb') as f:
+                    new_source = f.read()
+            except OSError:
+                pass
+    return old_source, new_source
+
+
+def analyze_diff(lines: Iterable[str], repo_path: str = '.', base: str = None) -> Iterator[Dict]:
+    """One record per touched method or class of each changed Python file
+
+    Records carry `before`, `after` and `delta` metrics; `before` is None for
+    new code (or when the pre-image isn't available) and `after` is None for
+    removed code.
+    """
+    repo = GitRepository(repo_path)
+    try:
+        for change in parse_unified_diff(lines):
+            path = change['new_path'] or change['old_path']
+            if not path.endswith('.py'):
+                continue
+            old_source, new_source = read_sources(change, repo, repo_path, base)
+            try:
+                old_tree = ast.parse(old_source, filename=path) if old_source is not None else None
+                new_tree = ast.parse(new_source, filename=path) if new_source is not None else None
+            except (SyntaxError, ValueError) as e:
+                yield {'kind': 'error', 'file': path, 'error': f"{type(e).__name__}: {e}"}
+                continue
+
+            old_lines, new_lines = sorted(change['old_lines']), sorted(change['new_lines'])
+            names = set()
+            if old_tree is not None:
+                names |= touched_names(old_tree, old_lines)
+            if new_tree is not None:
+                names |= touched_names(new_tree, new_lines)
+            before = scoped_metrics(old_tree, old_lines, names) if old_tree is not None else {}
+            after = scoped_metrics(new_tree, new_lines, names) if new_tree is not None else {}
+
+            for name in sorted(before.keys() | after.keys()):
+                old, new = before.get(name), after.get(name)
+                kind = 'method' if 'cc' in (new or old) else 'class'
+                yield {'kind': kind, 'file': path, 'name': name, 'before': old, 'after': new,
+                       'delta': delta(old, new)}
+    finally:
+        repo.close()
+
+
+def format_record(record: Dict) -> str:
+    fields = METHOD_FIELDS if record['kind'] == 'method' else CLASS_FIELDS
+    before, after = record['before'] or {}, record['after'] or {}
+    parts = []
+    for field in fields:
+        old, new = before.get(field, '-'), after.get(field, '-')
+        change = ''
+        if record['delta'] is not None and record['delta'][field]:
+            change = f" ({record['delta'][field]:+g})"
+        parts.append(f"{field.upper()}: {old} -> {new}{change}")
+    return f"  {record['name']:40s} " + "  ".join(parts)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Metrics for only the methods a diff touches")
+    parser.add_argument("diff", nargs="?", default="-", help="unified diff file (default: stdin)")
+    parser.add_argument("--repo", default=".", help="git repository the diff applies to")
+    parser.add_argument("--base", default=None,
+                        help="revision holding the pre-image when the diff has no index lines")
+    parser.add_argument("--format", choices=("text", "jsonl"), default="text")
+    args = parser.parse_args(argv)
+
+    if args.diff == "-":
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", errors="surrogateescape")
+    else:
+        stream = open(args.diff, encoding="utf-8", errors="surrogateescape")
+    try:
+        current = None
+        for record in analyze_diff(stream, args.repo, args.base):
+            if record['kind'] == 'error':
+                print(f"Skipped {record['file']}: {record['error']}", file=sys.stderr)
+            elif args.format == "jsonl":
+                sys.stdout.write(json.dumps(record, separators=(",", ":")) + "\n")
+            else:
+                if record['file'] != current:
+                    current = record['file']
+                    print(f"{current}:")
+                print(format_record(record))
+    finally:
+        if args.diff != "-":
+            stream.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
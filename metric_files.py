@@ -0,0 +1,20 @@
+"""
+Source discovery for the Metric Analysis Tool
+Kept free of the analyzer's heavier imports (NumPy, the AST passes) so
+lightweight tools such as metric_lines start quickly.
+"""
+import os
+from typing import List
+
+SKIPPED_DIRS = {'__pycache__', 'venv', 'env', 'node_modules', 'build', 'dist'}
+
+
+def find_python_files(root: str) -> List[str]:
+    """Recursively list .py files, skipping hidden, cache and virtualenv dirs"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames
+                             if not d.startswith('.') and d not in SKIPPED_DIRS)
+        found.extend(os.path.join(dirpath, name) for name in sorted(filenames)
+                     if name.endswith('.py'))
+    return found
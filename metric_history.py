@@ -0,0 +1,291 @@
+"""
+Git history trend mode for the Metric Analysis Tool
+Walks the commits of a local repository and emits a per-revision time series
+of CC/LOC/CBO. Blobs are read straight from the object database, only blobs
+whose hash changed since the previous revision are analyzed, and the totals
+are updated rather than recomputed over the whole tree.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from metric_analyzer import analyze_source, calculate_cbo, qualify
+
+BLOB_CACHE_SIZE = 4096  # Blob metrics kept for files that change back
+
+
+class GitRepository:
+    """Thin wrapper over the git plumbing commands used by the history walk"""
+
+    def __init__(self, path: str = "."):
+        self._path = path
+        self._cat_file: Optional[subprocess.Popen] = None
+
+    def _git(self, *args: str) -> bytes:
+        return subprocess.run(["git", "-C", self._path, *args], check=True,
+                              stdout=subprocess.PIPE).stdout
+
+    def revisions(self, rev: str = "HEAD", max_count: int = None) -> List[Tuple[str, int]]:
+        """(commit, commit timestamp) pairs, oldest first, following first parents"""
+        args = ["log", "--first-parent", "--format=%H %ct"]
+        if max_count:
+            args.append(f"--max-count={max_count}")
+        lines = self._git(*args, rev).decode().split()
+        pairs = [(lines[i], int(lines[i + 1])) for i in range(0, len(lines), 2)]
+        return pairs[::-1]
+
+    def tree_files(self, commit: str) -> Iterator[Tuple[str, str]]:
+        """(path, blob hash) for every Python file in a commit"""
+        for entry in self._git("ls-tree", "-r", "-z", "--full-tree", commit).split(b"\0"):
+            if not entry:
+                continue
+            meta, path = entry.split(b"\t", 1)
+            _, kind, sha = meta.split()
+            path = path.decode("utf-8", "surrogateescape")
+            if kind == b"blob" and path.endswith(".py"):
+                yield path, sha.decode()
+
+    def changed_files(self, old: str, new: str) -> Iterator[Tuple[str, Optional[str]]]:
+        """(path, new blob hash) for Python files changed between commits; None if deleted"""
+        fields = self._git("diff-tree", "-r", "-z", "--no-renames", old, new).split(b"\0")
+        for i in range(0, len(fields) - 1, 2):
+            meta, path = fields[i], fields[i + 1].decode("utf-8", "surrogateescape")
+            if not path.endswith(".py"):
+                continue
+            _, _, _, sha, status = meta.split()
+            yield path, None if status == b"D" else sha.decode()
+
+    def read_blob(self, sha: str) -> bytes:
+        """Blob content via one long-lived `git cat-file --batch` process"""
+        if self._cat_file is None:
+            self._cat_file = subprocess.Popen(["git", "-C", self._path, "cat-file", "--batch"],
+                                              stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self._cat_file.stdin.write(sha.encode() + b"\n")
+        self._cat_file.stdin.flush()
+        header = self._cat_file.stdout.readline().split()
+        if len(header) < 3:
+            raise ValueError(f"Missing blob {sha}")
+        content = self._cat_file.stdout.read(int(header[2]))
+        self._cat_file.stdout.read(1)  # Trailing newline
+        return content
+
+    def close(self) -> None:
+        if self._cat_file is not None:
+            self._cat_file.stdin.close()
+            self._cat_file.wait()
+            self._cat_file = None
+
+
+def git_module_name(path: str) -> str:
+    """Dotted module name of a repository-relative path"""
+    parts = path[:-3].split("/")
+    if parts[-1] == "__init__" and len(parts) > 1:
+        parts.pop()
+    return ".".join(parts)
+
+
+def blob_metrics(repo: GitRepository, sha: str) -> Dict:
+    """Summary plus per-file totals for a blob, or an empty entry if it doesn't parse"""
+    try:
+        summary = analyze_source(repo.read_blob(sha))
+    except (SyntaxError, ValueError, UnicodeDecodeError):
+        return {'summary': None, 'methods': 0, 'cc_total': 0, 'cc_max': 0, 'loc_total': 0,
+                'class_totals': {}}
+    complexity = summary['complexity']
+    class_totals = {class_name: [0, 0] for class_name in summary['classes']}
+    for method, cc in complexity.items():
+        totals = class_totals[method.rsplit('.', 1)[0]]
+        totals[0] += cc
+        totals[1] += summary['loc'][method]
+    return {
+        'summary': summary,
+        'methods': len(complexity),
+        'cc_total': sum(complexity.values()),
+        'cc_max': max(complexity.values(), default=0),
+        'loc_total': sum(summary['loc'].values()),
+        'class_totals': class_totals  # Class -> [CC, LOC] summed over its methods
+    }
+
+
+class HistoryState:
+    """Metrics of the files at the current revision, kept as running totals
+    
+    Adding or removing a file adjusts the sums and the value counts behind
+    the maxima. CBO is recomputed only for classes in changed files, or whose
+    references name a class that appeared or disappeared, so a revision costs
+    time in proportion to what it changed.
+    """
+
+    def __init__(self, per_class: bool = False):
+        self.files: Dict[str, Dict] = {}  # Path -> blob metrics
+        self._per_class = per_class
+        self._totals = Counter()  # errors, methods, cc_total, loc_total
+        self._cc_max = Counter()  # Per-file CC maximum -> files
+        self._names = Counter()  # Bare class name -> classes with that name
+        self._referrers: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        self._cbo: Dict[Tuple[str, str], int] = {}  # (path, class) -> CBO
+        self._cbo_values = Counter()
+        self._cbo_total = 0
+        self._stale: Set[Tuple[str, str]] = set()  # Classes whose CBO must be recomputed
+        self._class_rows: Dict[str, Dict] = {}  # Qualified class -> cc, loc, cbo
+
+    def _adjust(self, entry: Dict, sign: int) -> None:
+        self._totals['errors'] += sign * (entry['summary'] is None)
+        for key in ('methods', 'cc_total', 'loc_total'):
+            self._totals[key] += sign * entry[key]
+        self._cc_max[entry['cc_max']] += sign
+        if self._cc_max[entry['cc_max']] == 0:
+            del self._cc_max[entry['cc_max']]
+
+    def _set_cbo(self, key: Tuple[str, str], cbo: Optional[int]) -> None:
+        old = self._cbo.pop(key, None)
+        if old is not None:
+            self._cbo_total -= old
+            self._cbo_values[old] -= 1
+            if self._cbo_values[old] == 0:
+                del self._cbo_values[old]
+        if cbo is not None:
+            self._cbo[key] = cbo
+            self._cbo_total += cbo
+            self._cbo_values[cbo] += 1
+
+    def remove(self, path: str) -> None:
+        entry = self.files.pop(path, None)
+        if entry is None:
+            return
+        self._adjust(entry, -1)
+        classes = entry['summary']['classes'] if entry['summary'] else {}
+        module = git_module_name(path)
+        for class_name, info in classes.items():
+            key = (path, class_name)
+            self._set_cbo(key, None)
+            self._stale.discard(key)
+            self._class_rows.pop(qualify(module, class_name), None)
+            for ref in info['references']:
+                referrers = self._referrers[ref]
+                referrers.discard(key)
+                if not referrers:
+                    del self._referrers[ref]
+            self._names[class_name] -= 1
+            if self._names[class_name] == 0:
+                del self._names[class_name]
+                self._stale.update(self._referrers.get(class_name, ()))
+
+    def add(self, path: str, entry: Dict) -> None:
+        """Add or replace the metrics of `path`"""
+        self.remove(path)
+        self.files[path] = entry
+        self._adjust(entry, 1)
+        classes = entry['summary']['classes'] if entry['summary'] else {}
+        for class_name, info in classes.items():
+            key = (path, class_name)
+            for ref in info['references']:
+                self._referrers[ref].add(key)
+            if class_name not in self._names:
+                self._stale.update(self._referrers.get(class_name, ()))
+            self._names[class_name] += 1
+            self._stale.add(key)
+
+    def point(self) -> Dict:
+        """The aggregate metrics at the current revision"""
+        for path, class_name in sorted(self._stale):
+            entry = self.files[path]
+            cbo = calculate_cbo(class_name, entry['summary']['classes'], class_names=self._names)
+            self._set_cbo((path, class_name), cbo)
+            if self._per_class:
+                cc, loc = entry['class_totals'][class_name]
+                # A new dict, so rows of points already yielded are left as they were
+                self._class_rows[qualify(git_module_name(path), class_name)] = {
+                    'cc': cc, 'loc': loc, 'cbo': cbo}
+        self._stale.clear()
+
+        methods, cc_total = self._totals['methods'], self._totals['cc_total']
+        classes = len(self._cbo)
+        point = {
+            'files': len(self.files),
+            'errors': self._totals['errors'],
+            'methods': methods,
+            'cc_total': cc_total,
+            'cc_max': max(self._cc_max, default=0),
+            'cc_mean': round(cc_total / methods, 3) if methods else 0.0,
+            'loc_total': self._totals['loc_total'],
+            'classes': classes,
+            'cbo_max': max(self._cbo_values, default=0),
+            'cbo_mean': round(self._cbo_total / classes, 3) if classes else 0.0
+        }
+        if self._per_class:
+            point['per_class'] = dict(self._class_rows)
+        return point
+
+
+def iter_history(repo_path: str = ".", rev: str = "HEAD", max_count: int = None,
+                 per_class: bool = False, blob_cache: int = BLOB_CACHE_SIZE) -> Iterator[Dict]:
+    """Yield one metrics point per revision, oldest first
+    
+    The metrics of the last `blob_cache` blobs are kept, so files reverted to
+    a recent version are not analyzed again.
+    """
+    repo = GitRepository(repo_path)
+    blobs: OrderedDict = OrderedDict()  # Blob hash -> metrics, least recently used first
+    state = HistoryState(per_class)
+    previous = None
+    try:
+        for commit, timestamp in repo.revisions(rev, max_count):
+            if previous is None:
+                changes = repo.tree_files(commit)
+            else:
+                changes = repo.changed_files(previous, commit)
+
+            changed = 0
+            for path, sha in changes:
+                if sha is None:
+                    state.remove(path)
+                    continue
+                entry = blobs.get(sha)
+                if entry is None:
+                    entry = blobs[sha] = blob_metrics(repo, sha)
+                    changed += 1
+                    if len(blobs) > blob_cache:
+                        blobs.popitem(last=False)
+                else:
+                    blobs.move_to_end(sha)
+                state.add(path, entry)
+
+            point = {'commit': commit, 'timestamp': timestamp, 'analyzed': changed}
+            point.update(state.point())
+            yield point
+            previous = commit
+    finally:
+        repo.close()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="CC/LOC/CBO trends over git history")
+    parser.add_argument("repo", nargs="?", default=".", help="path to a git repository")
+    parser.add_argument("--rev", default="HEAD", help="revision to walk back from")
+    parser.add_argument("--max-count", type=int, default=None,
+                        help="only the most recent N first-parent commits")
+    parser.add_argument("--per-class", action="store_true",
+                        help="include CC, LOC and CBO for every class at each revision")
+    parser.add_argument("--blob-cache", type=int, default=BLOB_CACHE_SIZE,
+                        help="blob results kept for reverted files (default: 4096)")
+    parser.add_argument("--output", default=None, help="JSON Lines file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    stream = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for point in iter_history(args.repo, args.rev, args.max_count, args.per_class,
+                                  args.blob_cache):
+            stream.write(json.dumps(point, separators=(",", ":")) + "\n")
+            stream.flush()
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Fast line metrics for the Metric Analysis Tool
+Counts physical, source, logical, comment and blank lines with `tokenize`
+alone, without building an AST, and maps the counts onto def/class spans
+found by a lightweight scan of the token stream. Meant as a cheap first
+pass over huge trees before the heavier AST metrics.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tokenize
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from typing import Dict, List
+
+from metric_files import find_python_files
+
+CODE = 1
+COMMENT = 2
+
+
+def prefix_sums(flags) -> List[int]:
+    """prefix[n] is the number of true flags among lines 1..n"""
+    return [0] + list(accumulate(1 if flag else 0 for flag in flags))
+
+
+def count_lines(source: bytes) -> Dict:
+    """Line metrics for a module and for every def/class in it
+
+    `sloc` counts lines holding code, `comments` lines holding a comment
+    (trailing ones included) and `blank` lines holding neither; `lloc`
+    counts logical lines (statements ending in NEWLINE). Spans are keyed
+    by qualified name, e.g. `Course.enroll_student`.
+    """
+    total = source.count(b"\n") + (1 if source and not source.endswith(b"\n") else 0)
+    kinds = bytearray(total + 2)  # Per line: CODE and/or COMMENT bits
+    logical_ends = bytearray(total + 2)
+    spans = {}
+    open_blocks = []  # (qualified name, kind, body depth, start line)
+    pending = None  # Block whose header was seen but whose body hasn't started
+    depth = 0
+    last_code_line = 0
+    line_start = True
+    expect_name = None
+
+    def close_blocks(min_depth):
+        while open_blocks and open_blocks[-1][2] > min_depth:
+            name, kind, _, start = open_blocks.pop()
+            spans[name] = (kind, start, last_code_line)
+
+    for token in tokenize.tokenize(io.BytesIO(source).readline):
+        kind = token.type
+        if kind == tokenize.COMMENT:
+            kinds[token.start[0]] |= COMMENT
+            continue
+        if kind == tokenize.NL or kind == tokenize.ENCODING:
+            continue
+
+        if pending is not None and line_start and kind != tokenize.INDENT:
+            # Header ended without an indented body: `def f(): pass`
+            spans[pending[0]] = (pending[1], pending[3], last_code_line)
+            pending = None
+
+        if kind == tokenize.INDENT:
+            depth += 1
+            if pending is not None:
+                open_blocks.append((pending[0], pending[1], depth, pending[3]))
+                pending = None
+        elif kind == tokenize.DEDENT:
+            depth -= 1
+            close_blocks(depth)
+        elif kind == tokenize.NEWLINE:
+            logical_ends[token.start[0]] = 1
+            line_start = True
+        elif kind == tokenize.ENDMARKER:
+            close_blocks(-1)
+        else:
+            for line in range(token.start[0], token.end[0] + 1):
+                kinds[line] |= CODE
+            last_code_line = token.end[0]
+
+            if expect_name and kind == tokenize.NAME:
+                parent = open_blocks[-1][0] + "." if open_blocks else ""
+                pending = (parent + token.string, expect_name, None, token.start[0])
+                expect_name = None
+            elif line_start and kind == tokenize.NAME and token.string in ("def", "class"):
+                expect_name = token.string
+            # `async def` keeps the line open for the `def` that follows
+            line_start = line_start and kind == tokenize.NAME and token.string == "async"
+
+    code = prefix_sums(k & CODE for k in kinds[1:total + 1])
+    comments = prefix_sums(k & COMMENT for k in kinds[1:total + 1])
+    blank = prefix_sums(not k for k in kinds[1:total + 1])
+    logical = prefix_sums(logical_ends[1:total + 1])
+
+    def counts(start, end):
+        return {
+            'loc': end - start + 1,
+            'sloc': code[end] - code[start - 1],
+            'lloc': logical[end] - logical[start - 1],
+            'comments': comments[end] - comments[start - 1],
+            'blank': blank[end] - blank[start - 1]
+        }
+
+    result = counts(1, total) if total else dict.fromkeys(
+        ('loc', 'sloc', 'lloc', 'comments', 'blank'), 0)
+    result['spans'] = {}
+    for name, (block_kind, start, end) in sorted(spans.items(), key=lambda item: item[1][1]):
+        result['spans'][name] = {'kind': block_kind, 'start': start, 'end': end, **counts(start, end)}
+    return result
+
+
+def file_line_metrics(path: str) -> Dict:
+    """Line metrics for one file, or the error that stopped tokenizing it"""
+    try:
+        with open(path, "rb") as f:
+            result = count_lines(f.read())
+    except (OSError, SyntaxError, tokenize.TokenError, UnicodeDecodeError) as e:
+        return {'path': path, 'error': f"{type(e).__name__}: {e}"}
+    result['path'] = path
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fast SLOC/comment/blank counts without an AST")
+    parser.add_argument("path", help="Python file, or directory to scan recursively")
+    parser.add_argument("--format", choices=("text", "jsonl"), default="text")
+    parser.add_argument("--spans", action="store_true",
+                        help="include counts for every def/class in jsonl output")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for directories (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    paths = find_python_files(args.path) if os.path.isdir(args.path) else [args.path]
+    totals = dict.fromkeys(('files', 'loc', 'sloc', 'lloc', 'comments', 'blank'), 0)
+    with contextlib.ExitStack() as stack:
+        if len(paths) > 1:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=args.workers))
+            results = executor.map(file_line_metrics, paths, chunksize=64)
+        else:  # Not worth starting a pool for one file
+            results = map(file_line_metrics, paths)
+        for result in results:
+            if 'error' in result:
+                print(f"Skipped {result['path']}: {result['error']}", file=sys.stderr)
+                continue
+            totals['files'] += 1
+            for key in ('loc', 'sloc', 'lloc', 'comments', 'blank'):
+                totals[key] += result[key]
+            if args.format == "jsonl":
+                if not args.spans:
+                    del result['spans']
+                sys.stdout.write(json.dumps(result, separators=(",", ":")) + "\n")
+            else:
+                print(f"  {result['path']:50s} LOC: {result['loc']:6d}  SLOC: {result['sloc']:6d}  "
+                      f"LLOC: {result['lloc']:6d}  Comments: {result['comments']:5d}  "
+                      f"Blank: {result['blank']:5d}")
+
+    if args.format == "text":
+        print("-" * 60)
+        print(f"  {totals['files']} files  LOC: {totals['loc']}  SLOC: {totals['sloc']}  "
+              f"LLOC: {totals['lloc']}  Comments: {totals['comments']}  Blank: {totals['blank']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
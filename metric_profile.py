@@ -0,0 +1,109 @@
+"""
+Profiling hooks for the Metric Analysis Tool
+Times each analysis phase (wall and CPU), records per-file read/parse/visit
+times and AST node counts, samples peak memory, and dumps it all as a
+structured JSON profile so slow runs and pathological files can be found.
+"""
+import heapq
+import json
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+PhaseHook = Callable[[str, float, float], None]
+FileHook = Callable[[Dict], None]
+
+
+def peak_memory_kb() -> Dict[str, int]:
+    """Peak resident set size of this process and of finished worker processes"""
+    if resource is None:
+        return {}
+    scale = 1024 if sys.platform == 'darwin' else 1  # macOS reports bytes, Linux KB
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale
+    }
+
+
+class Profiler:
+    """Collects phase timings and per-file records; hooks see each one as it happens"""
+
+    def __init__(self, on_phase: PhaseHook = None, on_file: FileHook = None,
+                 slowest: int = 50):
+        self._on_phase = on_phase
+        self._on_file = on_file
+        self._slowest = slowest
+        self._heap: List = []  # Min-heap of the slowest files seen so far
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.files = 0
+        self.file_totals = {'bytes': 0, 'nodes': 0, 'read': 0.0, 'parse': 0.0, 'visit': 0.0,
+                            'cached': 0}
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as phase `name` (repeated phases accumulate)
+        
+        Yields a dict that holds this run's `wall` and `cpu` once the block exits.
+        """
+        timing = {}
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield timing
+        finally:
+            timing['wall'] = time.perf_counter() - wall
+            timing['cpu'] = time.process_time() - cpu
+            self.add_phase(name, timing['wall'], timing['cpu'])
+
+    def add_phase(self, name: str, wall: float, cpu: float) -> None:
+        totals = self.phases.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+        totals['wall'] += wall
+        totals['cpu'] += cpu
+        totals['calls'] += 1
+        if self._on_phase is not None:
+            self._on_phase(name, wall, cpu)
+
+    def add_file(self, record: Dict) -> None:
+        """Record one file's timings: path, bytes, nodes, read, parse, visit, cached"""
+        self.files += 1
+        for key in self.file_totals:
+            self.file_totals[key] += record.get(key, 0)
+        cost = record.get('parse', 0.0) + record.get('visit', 0.0)
+        entry = (cost, self.files, record)
+        if len(self._heap) < self._slowest:
+            heapq.heappush(self._heap, entry)
+        elif cost > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+        if self._on_file is not None:
+            self._on_file(record)
+
+    def slowest_files(self) -> List[Dict]:
+        return [record for _, _, record in sorted(self._heap, key=lambda e: (-e[0], e[1]))]
+
+    def report(self) -> Dict:
+        return {
+            'phases': self.phases,
+            'files': self.files,
+            'file_totals': self.file_totals,
+            'slowest_files': self.slowest_files(),
+            'peak_memory_kb': peak_memory_kb()
+        }
+
+    def dump(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+@contextmanager
+def maybe_phase(profiler: Optional[Profiler], name: str):
+    """profiler.phase(name), or nothing when profiling is off"""
+    if profiler is None:
+        yield {}
+    else:
+        with profiler.phase(name) as timing:
+            yield timing
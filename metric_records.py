@@ -0,0 +1,119 @@
+"""
+Compact class records for bounded-memory streaming in the Metric Analysis Tool
+While streaming, only what CBO, DIT and NOC need at the end of the run is
+kept: one `__slots__` record per class, with its references as an int array
+of interned names. Past a memory ceiling, records spill to a temporary file.
+"""
+import pickle
+import sys
+import tempfile
+from array import array
+from typing import Dict, Iterator, List, Set
+
+RECORD_OVERHEAD = 200  # Approximate bytes per record besides its strings and array items
+
+
+class StringTable:
+    """Interns strings as small ints"""
+
+    def __init__(self):
+        self._strings: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = self._ids[value] = len(self._strings)
+            self._strings.append(value)
+        return string_id
+
+    def lookup(self, value: str) -> int:
+        """Id of `value`, or -1 if it was never interned"""
+        return self._ids.get(value, -1)
+
+    def string(self, string_id: int) -> str:
+        return self._strings[string_id]
+
+
+class ClassRecord:
+    """Per-class results that are final as soon as its file is analyzed, plus what CBO needs"""
+
+    __slots__ = ('file', 'name', 'bare', 'lcom1', 'lcom4', 'references')
+
+    def __init__(self, file: str, name: str, bare: int, lcom1: int, lcom4: int,
+                 references: array):
+        self.file = file
+        self.name = name  # Qualified name
+        self.bare = bare  # Interned unqualified name
+        self.lcom1 = lcom1
+        self.lcom4 = lcom4
+        self.references = references  # Interned names referenced by the class
+
+    @classmethod
+    def from_summary(cls, strings: StringTable, file: str, name: str, bare: str, info: Dict,
+                     lcom1: int, lcom4: int) -> 'ClassRecord':
+        references = array('i', (strings.intern(ref) for ref in info['references']))
+        return cls(file, name, strings.intern(bare), lcom1, lcom4, references)
+
+    def cbo(self, class_ids: Set[int]) -> int:
+        """Same as calculate_cbo, given the interned bare names of every analyzed class"""
+        return len({ref for ref in self.references if ref in class_ids and ref != self.bare})
+
+    def size(self) -> int:
+        return (RECORD_OVERHEAD + sys.getsizeof(self.file) + sys.getsizeof(self.name)
+                + len(self.references) * self.references.itemsize)
+
+    def __reduce__(self):
+        return (ClassRecord, (self.file, self.name, self.bare, self.lcom1, self.lcom4,
+                              self.references))
+
+
+class RecordSpool:
+    """Records kept in memory up to `max_bytes`, then spilled in batches to a temporary file
+
+    Iteration yields spilled records first, then those still in memory, so
+    records come back in the order they were appended.
+    """
+
+    def __init__(self, max_bytes: int = None, directory: str = None):
+        self._max_bytes = max_bytes
+        self._directory = directory
+        self._records: List[ClassRecord] = []
+        self._bytes = 0
+        self._spill = None
+        self.spilled = 0
+
+    def append(self, record: ClassRecord) -> None:
+        self._records.append(record)
+        self._bytes += record.size()
+        if self._max_bytes is not None and self._bytes > self._max_bytes:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile(dir=self._directory)
+        self._spill.seek(0, 2)
+        pickle.dump(self._records, self._spill, protocol=pickle.HIGHEST_PROTOCOL)
+        self.spilled += len(self._records)
+        self._records = []
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return self.spilled + len(self._records)
+
+    def __iter__(self) -> Iterator[ClassRecord]:
+        if self._spill is not None:
+            self._spill.seek(0)
+            while True:
+                try:
+                    batch = pickle.load(self._spill)
+                except EOFError:
+                    break
+                yield from batch
+        yield from self._records
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+        self._records = []
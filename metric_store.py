@@ -0,0 +1,273 @@
+"""
+Columnar metric store for the Metric Analysis Tool
+Holds method and class metrics as interned names plus numeric columns, with
+vectorized aggregates (percentiles, histograms, top-K) and a compact .npz
+snapshot format. NumPy is optional for building and querying; snapshots
+need it.
+"""
+import argparse
+import heapq
+import math
+import sys
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Aggregates fall back to pure Python
+    np = None
+
+TABLES = {
+    'method': ('cc', 'loc', 'volume', 'mi'),
+    'class': ('cbo', 'dit', 'noc', 'lcom1', 'lcom4'),
+}
+FLOAT_COLUMNS = {'volume', 'mi'}  # float64; every other column (and string ids) int32
+MISSING = -1  # Stored for an undefined DIT (inheritance cycle) or a metric not recorded
+
+
+def _typecode(column: str) -> str:
+    """array/NumPy type code of a column"""
+    return 'd' if column in FLOAT_COLUMNS else 'i'
+
+
+def _percentile(ordered: Sequence[int], q: float) -> Optional[float]:
+    """Linear-interpolated percentile of sorted values, as numpy.percentile computes it
+    
+    None for no values.
+    """
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * q / 100
+    low, high = math.floor(position), math.ceil(position)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class MetricStore:
+    """Columnar method/class metrics; usable as a MetricWriter sink for stream_path"""
+
+    def __init__(self):
+        self._strings: List[str] = []  # Interned names and file paths
+        self._string_ids: Dict[str, int] = {}
+        self._blob = None  # Loaded snapshots decode strings lazily from (blob, offsets)
+        self._offsets = None
+        self._columns = {table: {column: array(_typecode(column))
+                                 for column in ('name', 'file') + columns}
+                         for table, columns in TABLES.items()}
+
+    def _intern(self, value: str) -> int:
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+        return string_id
+
+    def string(self, string_id: int) -> str:
+        if self._blob is None:
+            return self._strings[string_id]
+        start, end = int(self._offsets[string_id]), int(self._offsets[string_id + 1])
+        return bytes(self._blob[start:end]).decode('utf-8')
+
+    def _append(self, table: str, path: str, name: str, values: Tuple[float, ...]) -> None:
+        if self._blob is not None:
+            raise TypeError("Loaded snapshots are read-only; use merge() to combine stores")
+        columns = self._columns[table]
+        columns['name'].append(self._intern(name))
+        columns['file'].append(self._intern(path))
+        for column, value in zip(TABLES[table], values):
+            if value is None:
+                value = MISSING
+            columns[column].append(value if column in FLOAT_COLUMNS else round(value))
+
+    def write_method(self, path: str, name: str, cc: int, loc: int, volume: float = None,
+                     mi: float = None) -> None:
+        self._append('method', path, name, (cc, loc, volume, mi))
+
+    def write_class(self, path: str, name: str, cbo: int, dit: int, noc: int,
+                    lcom1: int, lcom4: int) -> None:
+        self._append('class', path, name, (cbo, dit, noc, lcom1, lcom4))
+
+    def flush(self) -> None:
+        pass  # Nothing buffered outside the columns
+
+    def __len__(self) -> int:
+        return sum(len(columns['name']) for columns in self._columns.values())
+
+    def column(self, table: str, column: str):
+        """A column as a NumPy array (zero-copy view) if NumPy is available"""
+        values = self._columns[table][column]
+        if np is not None and isinstance(values, array):
+            dtype = np.dtype(values.typecode)
+            return np.frombuffer(values, dtype=dtype) if len(values) else np.zeros(0, dtype)
+        return values
+
+    def _values(self, table: str, column: str):
+        """Column values, leaving out MISSING markers"""
+        values = self.column(table, column)
+        if np is not None:
+            return values[values != MISSING]
+        return [value for value in values if value != MISSING]
+
+    def summary(self, table: str, column: str) -> Dict[str, float]:
+        """Count, mean, max and common percentiles of a column"""
+        values = self._values(table, column)
+        if len(values) == 0:
+            return {'count': 0}
+        if np is not None:
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            return {'count': int(values.size), 'mean': float(values.mean()),
+                    'max': values.max().item(), 'p50': float(p50), 'p90': float(p90),
+                    'p99': float(p99)}
+        ordered = sorted(values)
+        return {'count': len(ordered), 'mean': sum(ordered) / len(ordered), 'max': ordered[-1],
+                'p50': _percentile(ordered, 50), 'p90': _percentile(ordered, 90),
+                'p99': _percentile(ordered, 99)}
+
+    def percentile(self, table: str, column: str, q: float) -> Optional[float]:
+        """Percentile `q` of a column, or None if it has no values"""
+        values = self._values(table, column)
+        if len(values) == 0:
+            return None
+        if np is not None:
+            return float(np.percentile(values, q))
+        return _percentile(sorted(values), q)
+
+    def histogram(self, table: str, column: str, bins: int = 10) -> Tuple[List[int], List[float]]:
+        """Counts and bin edges over equal-width bins, last bin inclusive"""
+        values = self._values(table, column)
+        if np is not None:
+            counts, edges = np.histogram(values, bins=bins)
+            return counts.tolist(), edges.tolist()
+        low, high = (min(values), max(values)) if values else (0, 1)
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        width = (high - low) / bins
+        counts = [0] * bins
+        for value in values:
+            counts[min(int((value - low) / width), bins - 1)] += 1
+        return counts, [low + width * i for i in range(bins + 1)]
+
+    def top_k(self, table: str, column: str, k: int = 10) -> List[Tuple[str, str, float]]:
+        """(name, file, value) for the k largest values, largest first"""
+        values = self.column(table, column)
+        names, files = self.column(table, 'name'), self.column(table, 'file')
+        if np is not None:
+            k = min(k, values.size)
+            if k == 0:
+                return []
+            indices = np.argpartition(-values, k - 1)[:k]
+            indices = indices[np.argsort(-values[indices], kind='stable')]
+        else:
+            indices = heapq.nlargest(k, range(len(values)), key=values.__getitem__)
+            return [(self.string(names[i]), self.string(files[i]), values[i]) for i in indices]
+        return [(self.string(names[i]), self.string(files[i]), values[i].item()) for i in indices]
+
+    def save(self, path: str) -> None:
+        """Write an uncompressed .npz snapshot (strings as one UTF-8 blob plus offsets)"""
+        if np is None:
+            raise RuntimeError("NumPy is required to save metric snapshots")
+        blob, offsets = self._string_arrays()
+        arrays = {'strings': blob, 'offsets': offsets}
+        for table, columns in self._columns.items():
+            for column in columns:
+                arrays[f"{table}.{column}"] = np.asarray(self.column(table, column),
+                                                         dtype=_typecode(column))
+        np.savez(path, **arrays)
+
+    def _string_count(self) -> int:
+        return len(self._strings) if self._blob is None else len(self._offsets) - 1
+
+    def _string_arrays(self):
+        """Strings as (UTF-8 blob, offsets) NumPy arrays, as snapshots store them"""
+        if self._blob is not None:
+            return self._blob, self._offsets
+        encoded = [value.encode('utf-8') for value in self._strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(item) for item in encoded])
+        return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+    @classmethod
+    def load(cls, path: str) -> 'MetricStore':
+        """Open a snapshot written by save(); names are decoded only when looked up"""
+        if np is None:
+            raise RuntimeError("NumPy is required to load metric snapshots")
+        store = cls()
+        with np.load(path) as data:
+            store._blob = data['strings']
+            store._offsets = data['offsets']
+            size = {table: len(data[f"{table}.name"]) for table in TABLES}
+            for table, columns in store._columns.items():
+                for column in columns:
+                    key = f"{table}.{column}"
+                    dtype = np.dtype(_typecode(column))
+                    # Snapshots from before a column existed read it as all MISSING,
+                    # and older integer volume/MI columns are widened to float
+                    columns[column] = (data[key].astype(dtype, copy=False) if key in data.files
+                                       else np.full(size[table], MISSING, dtype=dtype))
+        return store
+
+    @classmethod
+    def merge(cls, stores: Sequence['MetricStore']) -> 'MetricStore':
+        """Combine stores, e.g. snapshots of several repositories
+        
+        With NumPy the string tables are concatenated rather than re-interned,
+        each store's ids shifted past the previous ones, and the result is
+        read-only like a loaded snapshot.
+        """
+        merged = cls()
+        if np is not None and stores:
+            blobs, offsets, bases = [], [], []
+            strings = size = 0
+            for store in stores:
+                blob, store_offsets = store._string_arrays()
+                blobs.append(blob)
+                offsets.append(store_offsets[:-1] + size)
+                bases.append(strings)
+                strings += len(store_offsets) - 1
+                size += len(blob)
+            merged._blob = np.concatenate(blobs)
+            merged._offsets = np.concatenate(offsets + [np.array([size], dtype=np.int64)])
+            for table, columns in merged._columns.items():
+                for column in columns:
+                    parts = [store.column(table, column) for store in stores]
+                    if column in ('name', 'file'):
+                        parts = [part + base for part, base in zip(parts, bases)]
+                    columns[column] = np.concatenate(parts).astype(_typecode(column), copy=False)
+            return merged
+        for store in stores:
+            remap = [merged._intern(store.string(i)) for i in range(store._string_count())]
+            for table, columns in store._columns.items():
+                target = merged._columns[table]
+                target['name'].extend(remap[i] for i in columns['name'])
+                target['file'].extend(remap[i] for i in columns['file'])
+                for column in TABLES[table]:
+                    target[column].extend(columns[column])
+        return merged
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Query metric snapshots written with --format npz")
+    parser.add_argument("snapshots", nargs="+", help=".npz snapshots, merged if several")
+    parser.add_argument("--metric", default="cc",
+                        help="column to summarize: cc, loc, volume, mi, cbo, dit, noc, lcom1, lcom4")
+    parser.add_argument("--top", type=int, default=10, help="how many of the largest values to list")
+    args = parser.parse_args(argv)
+
+    table = next((name for name, columns in TABLES.items() if args.metric in columns), None)
+    if table is None:
+        parser.error(f"unknown metric: {args.metric}")
+    stores = [MetricStore.load(path) for path in args.snapshots]
+    store = stores[0] if len(stores) == 1 else MetricStore.merge(stores)
+
+    stats = store.summary(table, args.metric)
+    print(f"{args.metric.upper()} over {stats['count']} {'classes' if table == 'class' else 'methods'}")
+    for key, value in stats.items():
+        if key != 'count':
+            print(f"  {key:10s} {value:.2f}")
+    print(f"\nTop {args.top}:")
+    for name, path, value in store.top_k(table, args.metric, args.top):
+        print(f"  {name:40s} {args.metric.upper()}: {value}  ({path})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
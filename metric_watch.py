@@ -0,0 +1,205 @@
+"""
+Watch mode for the Metric Analysis Tool
+A long-lived process that polls a tree for changed files and answers metric
+queries over stdin/stdout or a local Unix socket. When a file changes it is
+re-parsed, but methods whose source text is unchanged reuse their metrics.
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import socketserver
+import sys
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from metric_analyzer import (
+    MetricAnalyzer, calculate_cbo, calculate_lcom, calculate_lcom4, find_python_files, summarize
+)
+
+MethodMetrics = Tuple[int, int, Set[str], Set[str], List[int], int]
+
+
+class IncrementalAnalyzer(MetricAnalyzer):
+    """MetricAnalyzer that reuses metrics of methods whose source text is unchanged"""
+
+    def __init__(self, source: str, memo: Dict[str, MethodMetrics]):
+        super().__init__()
+        self._lines = source.splitlines(keepends=True)
+        self._memo = memo
+        self.used: Dict[str, MethodMetrics] = {}  # Memo for the next analysis of this file
+        self.reused = 0
+
+    def method_metrics(self, node) -> MethodMetrics:
+        span = "".join(self._lines[node.lineno - 1:node.end_lineno])
+        key = hashlib.sha1(span.encode("utf-8", "surrogatepass")).hexdigest()
+        if key in self._memo:
+            self.reused += 1
+            self.used[key] = self._memo[key]
+            return self._memo[key]
+
+        classes_before = len(self.classes)
+        metrics = super().method_metrics(node)
+        # Methods defining nested classes also fill self.classes, so always re-run them
+        if len(self.classes) == classes_before:
+            self.used[key] = metrics
+        return metrics
+
+
+class MetricWatcher:
+    """In-memory metrics for a tree, kept current by polling mtimes"""
+
+    def __init__(self, root: str):
+        self._root = root
+        self._files: Dict[str, Dict] = {}  # Path -> stat, summary and method memo
+        self._lock = threading.Lock()
+        self.analyzed = 0
+        self.reused = 0
+
+    def refresh(self, path: str) -> Optional[Dict]:
+        """Re-analyze `path` if its mtime or size changed; returns its current entry"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._files.pop(path, None)
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None and entry['stamp'] == stamp:
+                return entry
+            memo = entry['memo'] if entry is not None else {}
+
+        entry = {'stamp': stamp, 'memo': memo, 'summary': None, 'error': None}
+        try:
+            with open(path, encoding="utf-8") as f:
+                source = f.read()
+            analyzer = IncrementalAnalyzer(source, memo)
+            analyzer.visit(ast.parse(source, filename=path))
+        except (OSError, SyntaxError, UnicodeDecodeError, ValueError) as e:
+            entry['error'] = f"{type(e).__name__}: {e}"  # Keep the old memo for the fix
+        else:
+            entry['summary'] = summarize(analyzer)
+            entry['memo'] = analyzer.used
+
+        with self._lock:
+            self._files[path] = entry
+            self.analyzed += 1
+            if entry['error'] is None:
+                self.reused += analyzer.reused
+        return entry
+
+    def scan(self) -> int:
+        """Refresh every file under the root; returns how many were (re)analyzed"""
+        before = self.analyzed
+        paths = {os.path.normpath(path) for path in find_python_files(self._root)}
+        with self._lock:
+            for path in set(self._files) - paths:
+                del self._files[path]
+        for path in paths:
+            self.refresh(path)
+        return self.analyzed - before
+
+    def watch(self, stop: threading.Event, interval: float = 0.5) -> None:
+        """Poll the tree until `stop` is set"""
+        while not stop.is_set():
+            self.scan()
+            stop.wait(interval)
+
+    def file_report(self, path: str) -> Dict:
+        """Metrics for one file, refreshed first so the answer is never stale"""
+        path = os.path.normpath(path if os.path.isabs(path) else os.path.join(self._root, path))
+        entry = self.refresh(path)
+        if entry is None:
+            return {'path': path, 'error': "not found"}
+        if entry['error']:
+            return {'path': path, 'error': entry['error']}
+
+        summary = entry['summary']
+        classes = summary['classes']
+        with self._lock:
+            class_names = {name for other in self._files.values() if other['summary']
+                           for name in other['summary']['classes']}
+        class_names.update(classes)
+        return {
+            'path': path,
+            'methods': {name: {'cc': cc, 'loc': summary['loc'][name], 'mi': summary['mi'][name]}
+                        for name, cc in summary['complexity'].items()},
+            'classes': {name: {'cbo': calculate_cbo(name, classes, class_names=class_names),
+                               'lcom1': calculate_lcom(name, classes),
+                               'lcom4': calculate_lcom4(name, classes)}
+                        for name in classes}
+        }
+
+    def query(self, line: str) -> Dict:
+        """Answer one protocol line: `file <path>` or `stats`"""
+        command, _, argument = line.strip().partition(" ")
+        if command == "file" and argument:
+            return self.file_report(argument)
+        if command == "stats":
+            with self._lock:
+                files = len(self._files)
+            return {'files': files, 'analyzed': self.analyzed, 'reused_methods': self.reused}
+        return {'error': f"unknown query: {line.strip()}"}
+
+
+def serve_pipe(watcher: MetricWatcher) -> None:
+    """Answer queries from stdin, one JSON line per query, until EOF or `quit`"""
+    for line in sys.stdin:
+        if line.strip() == "quit":
+            break
+        if line.strip():
+            print(json.dumps(watcher.query(line), separators=(",", ":")), flush=True)
+
+
+def serve_socket(watcher: MetricWatcher, socket_path: str) -> None:
+    """Answer queries on a Unix domain socket until interrupted"""
+    class QueryHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                line = raw.decode("utf-8").strip()
+                if line == "quit":
+                    break
+                if line:
+                    reply = json.dumps(watcher.query(line), separators=(",", ":"))
+                    self.wfile.write(reply.encode("utf-8") + b"\n")
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    with socketserver.ThreadingUnixStreamServer(socket_path, QueryHandler) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_path)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Keep metrics for a tree warm and answer queries")
+    parser.add_argument("root", help="directory to watch")
+    parser.add_argument("--interval", type=float, default=0.5, help="poll interval in seconds")
+    parser.add_argument("--socket", default=None,
+                        help="Unix socket path to serve on (default: queries on stdin)")
+    args = parser.parse_args(argv)
+
+    watcher = MetricWatcher(args.root)
+    watcher.scan()
+    stop = threading.Event()
+    poller = threading.Thread(target=watcher.watch, args=(stop, args.interval), daemon=True)
+    poller.start()
+    try:
+        if args.socket:
+            serve_socket(watcher, args.socket)
+        else:
+            serve_pipe(watcher)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
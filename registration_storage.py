@@ -0,0 +1,435 @@
+"""
+SQLite storage backend for the University Course Registration System
+Stands in for the Registrar's in-memory indexes with indexed SQLite tables.
+Records are loaded on demand (a student's grades and attendance only when
+first used) and kept only while something references them; writes are
+buffered and committed in batched transactions; reads use a small pool of
+connections so several threads can query at once.
+
+Registrar, Student, Course and Lecturer keep their API. Changes made through
+it are saved, apart from Person.update_contact.
+"""
+import queue
+import sqlite3
+import threading
+import weakref
+from collections.abc import MutableMapping, ValuesView
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from University_Course_Registration_System_Refactored import (
+    AttendanceRecord, Course, Lecturer, Student
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, phone TEXT);
+CREATE TABLE IF NOT EXISTS lecturers (
+    id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, department TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS courses (
+    code TEXT PRIMARY KEY, title TEXT NOT NULL, credit_hours INTEGER NOT NULL, lecturer_id TEXT);
+CREATE INDEX IF NOT EXISTS courses_by_lecturer ON courses (lecturer_id);
+CREATE TABLE IF NOT EXISTS enrollments (
+    student_id TEXT NOT NULL, course_code TEXT NOT NULL,
+    PRIMARY KEY (student_id, course_code)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS enrollments_by_course ON enrollments (course_code, student_id);
+CREATE TABLE IF NOT EXISTS grades (
+    student_id TEXT NOT NULL, course_code TEXT NOT NULL, grade TEXT NOT NULL,
+    PRIMARY KEY (student_id, course_code)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS attendance (
+    student_id TEXT NOT NULL, course_code TEXT NOT NULL, sessions INTEGER NOT NULL,
+    bits BLOB NOT NULL,
+    PRIMARY KEY (student_id, course_code)) WITHOUT ROWID;
+"""
+
+# Buffered writes per table; a later write to the same key replaces an earlier one
+UPSERTS = {
+    'students': "INSERT OR REPLACE INTO students VALUES (?, ?, ?, ?)",
+    'lecturers': "INSERT OR REPLACE INTO lecturers VALUES (?, ?, ?, ?)",
+    'courses': "INSERT OR REPLACE INTO courses VALUES (?, ?, ?, ?)",
+    'enrollments': "INSERT OR IGNORE INTO enrollments VALUES (?, ?)",
+    'grades': "INSERT OR REPLACE INTO grades VALUES (?, ?, ?)",
+    'attendance': "INSERT OR REPLACE INTO attendance VALUES (?, ?, ?, ?)",
+}
+KEY_COLUMNS = {'students': 'id', 'lecturers': 'id', 'courses': 'code'}
+FETCH_SIZE = 1000
+
+
+class ConnectionPool:
+    """Up to `size` SQLite connections, created on demand and reused"""
+
+    def __init__(self, path: str, size: int = 4):
+        self._path = path
+        self._size = size
+        self._created = 0
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        # Autocommit mode; SQLiteStorage issues BEGIN/COMMIT around its batches
+        connection = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @contextmanager
+    def connection(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self._size
+                if create:
+                    self._created += 1
+            connection = self.connect() if create else self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class RelationMap(MutableMapping):
+    """One owner's records (a student's grades, a course's students, ...), loaded on first read
+
+    Writes go to the storage's buffer, and to the loaded records if any, so
+    reads always see them.
+    """
+
+    def __init__(self, load: Callable[[], Dict], save: Callable, exists: Callable = None):
+        self._load = load
+        self._save = save
+        self._exists = exists
+        self._items: Optional[Dict] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._items is not None
+
+    def _records(self) -> Dict:
+        if self._items is None:
+            self._items = self._load()
+        return self._items
+
+    def __getitem__(self, key):
+        return self._records()[key]
+
+    def __setitem__(self, key, value) -> None:
+        self._save(key, value)
+        if self._items is not None:
+            self._items[key] = value
+
+    def __delitem__(self, key) -> None:
+        raise TypeError("Stored records can't be deleted")
+
+    def __contains__(self, key) -> bool:
+        if self._items is None and self._exists is not None:
+            return self._exists(key)  # Point query instead of loading everything
+        return key in self._records()
+
+    def __iter__(self):
+        return iter(self._records())
+
+    def __len__(self) -> int:
+        return len(self._records())
+
+
+class StoredValues(ValuesView):
+    """Values of a StoredTable, read from the table in pages"""
+
+    def __iter__(self):
+        return self._mapping.objects()
+
+
+class StoredTable(MutableMapping):
+    """A Registrar index backed by a table: objects by key, built on first lookup
+
+    Objects are kept only while referenced elsewhere, so looking one up again
+    returns the same object as long as it is in use.
+    """
+
+    def __init__(self, storage: 'SQLiteStorage', table: str, build: Callable[[Tuple], object],
+                 row_of: Callable[[object], Tuple]):
+        self._storage = storage
+        self._table = table
+        self._key = KEY_COLUMNS[table]
+        self._build = build
+        self._row_of = row_of
+        self._live = weakref.WeakValueDictionary()
+
+    def object_for(self, row: Tuple):
+        """The live object for a row, or a new one built from it"""
+        obj = self._live.get(row[0])
+        if obj is None:
+            obj = self._live[row[0]] = self._build(row)
+        return obj
+
+    def __getitem__(self, key):
+        obj = self._live.get(key)
+        if obj is not None:
+            return obj
+        row = self._storage.pending(self._table, key) or self._storage.fetch_one(
+            f"SELECT * FROM {self._table} WHERE {self._key} = ?", (key,))
+        if row is None:
+            raise KeyError(key)
+        return self.object_for(row)
+
+    def __setitem__(self, key, obj) -> None:
+        self._storage.write(self._table, key, self._row_of(obj))
+        self._live[key] = obj
+        self._storage.adopt(self._table, obj)
+
+    def __delitem__(self, key) -> None:
+        raise TypeError("Stored records can't be deleted")
+
+    def __contains__(self, key) -> bool:
+        if key in self._live or self._storage.pending(self._table, key) is not None:
+            return True
+        return self._storage.fetch_one(
+            f"SELECT 1 FROM {self._table} WHERE {self._key} = ?", (key,)) is not None
+
+    def __len__(self) -> int:
+        self._storage.flush()  # Buffered rows count too
+        return self._storage.fetch_one(f"SELECT COUNT(*) FROM {self._table}")[0]
+
+    def __iter__(self) -> Iterator[str]:
+        for row in self._storage.fetch_all(f"SELECT {self._key} FROM {self._table}"):
+            yield row[0]
+
+    def objects(self) -> Iterator:
+        for row in self._storage.fetch_all(f"SELECT * FROM {self._table}"):
+            yield self.object_for(row)
+
+    def values(self) -> StoredValues:
+        return StoredValues(self)
+
+    def forget(self) -> None:
+        self._live = weakref.WeakValueDictionary()
+
+
+class SQLiteStorage:
+    """SQLite persistence for a Registrar: pass it as `Registrar(storage)`
+
+    Writes are buffered and committed every `batch_size` records, on
+    flush()/close(), or at the end of a transaction() block, which commits
+    or rolls back everything written inside it. ':memory:' databases use a
+    single connection.
+    """
+
+    def __init__(self, path: str, pool_size: int = 4, batch_size: int = 1000):
+        self._pool = ConnectionPool(path, pool_size)
+        self._shared = path == ':memory:'  # Every connection would get its own empty database
+        self._writer = self._pool.connect()
+        self._writer.executescript(SCHEMA)
+        self._batch_size = batch_size
+        self._pending: Dict[str, Dict] = {table: {} for table in UPSERTS}
+        self._pending_count = 0
+        self._depth = 0  # Open transaction() blocks
+        self._lock = threading.RLock()
+        self.students = StoredTable(self, 'students', self._build_student,
+                                    lambda s: (s.person_id, s.name, s.email, s.phone))
+        self.lecturers = StoredTable(self, 'lecturers', self._build_lecturer,
+                                     lambda l: (l.person_id, l.name, l.email, l.department))
+        self.courses = StoredTable(self, 'courses', self._build_course, self._course_row)
+
+    # Writes
+
+    def write(self, table: str, key, row: Tuple) -> None:
+        with self._lock:
+            self._pending[table][key] = row
+            self._pending_count += 1
+            if self._pending_count >= self._batch_size:
+                self.flush()
+
+    def pending(self, table: str, key) -> Optional[Tuple]:
+        """A buffered row not yet written to the database"""
+        return self._pending[table].get(key)
+
+    def _write_pending(self) -> None:
+        for table, rows in self._pending.items():
+            if rows:
+                self._writer.executemany(UPSERTS[table], rows.values())
+                rows.clear()
+        self._pending_count = 0
+
+    def flush(self) -> None:
+        """Write buffered rows; committed now unless inside a transaction() block"""
+        with self._lock:
+            if not self._pending_count:
+                return
+            if self._depth:
+                self._write_pending()
+                return
+            self._writer.execute("BEGIN")
+            try:
+                self._write_pending()
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            self._writer.execute("COMMIT")
+
+    @contextmanager
+    def transaction(self):
+        """Commit everything written inside the block together, or roll it all back"""
+        with self._lock:  # Other threads' writes wait until the block ends
+            if self._depth == 0:
+                self.flush()
+                self._writer.execute("BEGIN")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    for rows in self._pending.values():
+                        rows.clear()
+                    self._pending_count = 0
+                    self._writer.execute("ROLLBACK")
+                    self._forget()
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                try:
+                    self._write_pending()
+                except BaseException:
+                    self._writer.execute("ROLLBACK")
+                    self._forget()
+                    raise
+                self._writer.execute("COMMIT")
+
+    def _forget(self) -> None:
+        """Drop cached objects after a rollback so later lookups reload them"""
+        for table in (self.students, self.lecturers, self.courses):
+            table.forget()
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.close()
+        self._pool.close()
+
+    # Reads
+
+    @contextmanager
+    def _reader(self):
+        # Inside a transaction only the writer sees its uncommitted rows
+        if self._shared or self._depth:
+            with self._lock:
+                yield self._writer
+        else:
+            with self._pool.connection() as connection:
+                yield connection
+
+    def fetch_one(self, sql: str, params: Tuple = ()) -> Optional[Tuple]:
+        with self._reader() as connection:
+            return connection.execute(sql, params).fetchone()
+
+    def fetch_all(self, sql: str, params: Tuple = ()) -> Iterator[Tuple]:
+        """Rows in pages of FETCH_SIZE, after writing anything buffered"""
+        self.flush()
+        with self._reader() as connection:
+            cursor = connection.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    return
+                yield from rows
+
+    def _enrolled(self, student_id: str, code: str) -> bool:
+        return (self.pending('enrollments', (student_id, code)) is not None
+                or self.fetch_one("SELECT 1 FROM enrollments WHERE student_id = ? AND course_code = ?",
+                                  (student_id, code)) is not None)
+
+    # Objects
+
+    def _course_row(self, course: Course) -> Tuple:
+        lecturer = course.lecturer
+        return (course.code, course.title, course.credit_hours,
+                lecturer.person_id if lecturer else None)
+
+    def _build_student(self, row: Tuple) -> Student:
+        student = Student(*row)
+        self._attach_student(student)
+        return student
+
+    def _build_lecturer(self, row: Tuple) -> Lecturer:
+        lecturer = Lecturer(*row)
+        self._attach_lecturer(lecturer)
+        return lecturer
+
+    def _build_course(self, row: Tuple) -> Course:
+        code, title, credit_hours, lecturer_id = row
+        lecturer = self.lecturers.get(lecturer_id) if lecturer_id else None
+        course = Course(code, title, credit_hours, lecturer)
+        self._attach_course(course)
+        return course
+
+    def adopt(self, table: str, obj) -> None:
+        """Move the records of an object added through the Registrar into the database"""
+        if table == 'students':
+            self._attach_student(obj)
+        elif table == 'lecturers':
+            self._attach_lecturer(obj)
+        else:
+            self._attach_course(obj)
+
+    def _attach_student(self, student: Student) -> None:
+        student_id = student.person_id
+
+        def load_courses():
+            return {row[0]: self.courses.object_for(row) for row in self.fetch_all(
+                "SELECT c.* FROM enrollments e JOIN courses c ON c.code = e.course_code "
+                "WHERE e.student_id = ?", (student_id,))}
+
+        def load_attendance():
+            return {code: AttendanceRecord.from_bytes(bits, sessions)
+                    for code, sessions, bits in self.fetch_all(
+                        "SELECT course_code, sessions, bits FROM attendance WHERE student_id = ?",
+                        (student_id,))}
+
+        student.use_storage(
+            RelationMap(load_courses,
+                        lambda code, course: self.write('enrollments', (student_id, code),
+                                                        (student_id, code)),
+                        lambda code: self._enrolled(student_id, code)),
+            RelationMap(lambda: dict(self.fetch_all(
+                            "SELECT course_code, grade FROM grades WHERE student_id = ?",
+                            (student_id,))),
+                        lambda code, grade: self.write('grades', (student_id, code),
+                                                       (student_id, code, grade))),
+            RelationMap(load_attendance,
+                        lambda code, records: self.write(
+                            'attendance', (student_id, code),
+                            (student_id, code, len(records), records.to_bytes()))))
+
+    def _attach_course(self, course: Course) -> None:
+        code = course.code
+
+        def load_students():
+            return {row[0]: self.students.object_for(row) for row in self.fetch_all(
+                "SELECT s.* FROM enrollments e JOIN students s ON s.id = e.student_id "
+                "WHERE e.course_code = ?", (code,))}
+
+        course.use_storage(RelationMap(
+            load_students,
+            lambda student_id, student: self.write('enrollments', (student_id, code),
+                                                   (student_id, code)),
+            lambda student_id: self._enrolled(student_id, code)))
+
+    def _attach_lecturer(self, lecturer: Lecturer) -> None:
+        staff_id = lecturer.person_id
+
+        def assign(code, course):
+            # Courses not yet added to the Registrar are saved, lecturer included, when they are
+            if code in self.courses:
+                self.write('courses', code, (code, course.title, course.credit_hours, staff_id))
+
+        lecturer.use_storage(RelationMap(
+            lambda: {row[0]: self.courses.object_for(row) for row in self.fetch_all(
+                "SELECT * FROM courses WHERE lecturer_id = ?", (staff_id,))},
+            assign))
@@ -0,0 +1,563 @@
+"""
+Test script to verify the metric analyzer calculations
+"""
+import ast
+import contextlib
+import csv
+import io
+import json
+import math
+import os
+import subprocess
+import tempfile
+
+from metric_analyzer import (
+    ANALYZER_VERSION, ComplexityAnalyzer, MetricAnalyzer, analyze_directory, analyze_file, calculate_cbo,
+    calculate_lcom, MetricWriter, calculate_lcom4, compute_hierarchy, halstead_volume,
+    main, maintainability_index, parse_thresholds, run_gate, stream_path
+)
+from benchmark_analyzer import generate_corpus
+from metric_cache import ResultCache
+from metric_diff import analyze_diff, parse_unified_diff
+from metric_history import iter_history
+from metric_lines import count_lines
+from metric_profile import Profiler
+from metric_records import ClassRecord, RecordSpool, StringTable
+from metric_store import MetricStore, np
+from metric_watch import MetricWatcher
+
+SAMPLE_SOURCE = '''
+class Engine:
+    def start(self):
+        self.running = True
+
+class Wheel:
+    pass
+
+class Car:
+    def __init__(self):
+        self.engine = Engine()
+        self.wheels = [Wheel() for _ in range(4)]
+
+    def drive(self):
+        Engine.start(self.engine)
+        self.engine.start()
+'''
+
+
+def analyze_source(source: str) -> MetricAnalyzer:
+    analyzer = MetricAnalyzer()
+    analyzer.visit(ast.parse(source))
+    return analyzer
+
+
+def commit(root: str, files: dict, message: str) -> None:
+    for name, source in files.items():
+        with open(os.path.join(root, name), "w") as f:
+            f.write(source)
+    subprocess.run(["git", "-C", root, "add", "-A"], check=True)
+    subprocess.run(["git", "-C", root, "-c", "user.name=test", "-c", "user.email=test@uni.com",
+                    "commit", "-qm", message], check=True)
+
+
+def test_cbo_counts_distinct_classes():
+    """CBO counts each coupled class once, from a single parse"""
+    analyzer = analyze_source(SAMPLE_SOURCE)
+    
+    assert calculate_cbo("Car", analyzer.classes) == 2, "Car uses Engine and Wheel"
+    assert calculate_cbo("Engine", analyzer.classes) == 0, "Engine uses no other class"
+    assert calculate_cbo("Missing", analyzer.classes) == 0, "Unknown class has no coupling"
+    try:
+        calculate_cbo("Car", analyzer.classes, SAMPLE_SOURCE)
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("Old source_code argument must not be taken as class names")
+
+
+def test_single_pass_method_metrics():
+    """Nested defs, async methods, match, comprehensions and try/else"""
+    source = '''
+class Service:
+    async def fetch(self, items):
+        try:
+            data = [x for x in items if x]
+        except ValueError:
+            data = []
+        else:
+            self.cache = data
+        def helper(value):
+            return value if value else None
+        class Result:
+            def ok(self):
+                return True
+        match data:
+            case []:
+                return None
+            case _:
+                return helper(data)
+'''
+    analyzer = analyze_source(source)
+    
+    # try handler + else, comprehension + its if, closure IfExp, one non-wildcard case
+    assert analyzer.complexity["Service.fetch"] == 7, "Decision points counted once"
+    assert "Service.helper" not in analyzer.complexity, "Closures are not methods"
+    assert analyzer.complexity["Service.Result.ok"] == 1, "Nested class methods measured separately"
+    assert analyzer.classes["Service"]["methods"] == ["fetch"], "Only direct methods listed"
+    assert analyzer.classes["Service"]["attributes"] == {"cache"}, "Self attributes tracked"
+    
+    nested = analyze_source("class A:\n    class Meta:\n        def f(self):\n            return 1\n"
+                            "class B:\n    class Meta:\n        def g(self):\n            return 2\n")
+    assert set(nested.classes) == {"A", "A.Meta", "B", "B.Meta"}, "Nested classes qualified"
+    assert nested.classes["A.Meta"]["methods"] == ["f"], "Same-named nested classes kept apart"
+    assert set(nested.mi) == {"A.Meta.f", "B.Meta.g"}, "Methods keyed by the qualified class"
+
+
+def test_directory_analysis_merges_files():
+    """Files are analyzed in worker processes and merged by module name"""
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, "models"))
+        with open(os.path.join(root, "models", "car.py"), "w") as f:
+            f.write(SAMPLE_SOURCE)
+        with open(os.path.join(root, "garage.py"), "w") as f:
+            f.write("class Garage:\n    def park(self, car):\n        return Car.drive(car)\n")
+        with open(os.path.join(root, "broken.py"), "w") as f:
+            f.write("class Broken(:\n")
+        
+        merged = analyze_directory(root, workers=2, chunk_size=1)
+    
+    assert merged["complexity"]["models.car.Car.drive"] == 1, "Methods keyed by module"
+    assert "garage.Garage" in merged["classes"], "Every file is merged"
+    assert merged["dit"]["models.car.Engine"] == 0, "DIT computed per class"
+    assert list(merged["errors"]) == [os.path.join(root, "broken.py")], "Bad files reported"
+
+
+def test_cache_skips_unchanged_files():
+    """A second run reuses cached summaries and only re-analyzes edited files"""
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as cache_dir:
+        for name in ("a.py", "b.py"):
+            with open(os.path.join(root, name), "w") as f:
+                f.write(SAMPLE_SOURCE)
+        first = analyze_directory(root, workers=1, cache=ResultCache(cache_dir, ANALYZER_VERSION))
+        
+        cache = ResultCache(cache_dir, ANALYZER_VERSION)
+        second = analyze_directory(root, workers=1, cache=cache)
+        assert cache.hits == 2, "Both unchanged files served from the cache"
+        assert second == first, "Cached results match a fresh analysis"
+        
+        with open(os.path.join(root, "b.py"), "w") as f:
+            f.write("class Other:\n    pass\n")
+        third = analyze_directory(root, workers=1, cache=ResultCache(cache_dir, ANALYZER_VERSION))
+        assert "b.Other" in third["classes"], "Edited file re-analyzed"
+        
+        small = ResultCache(cache_dir, ANALYZER_VERSION, max_bytes=1)
+        assert small.evict() > 0, "Entries beyond the size limit are evicted"
+
+
+def test_lcom_from_method_attribute_masks():
+    """LCOM1 from pairwise attribute sharing, LCOM4 from connected method groups"""
+    source = '''
+class Account:
+    def deposit(self, amount):
+        self.balance += amount
+
+    def withdraw(self, amount):
+        self.balance -= amount
+        self.log()
+
+    def log(self):
+        self.history.append(self.balance)
+
+    def rename(self, name):
+        self.name = name
+'''
+    analyzer = analyze_source(source)
+    
+    # Sharing pairs: deposit/withdraw, deposit/log, withdraw/log; the other 3 pairs share nothing
+    assert calculate_lcom("Account", analyzer.classes) == 0, "3 disjoint - 3 shared"
+    assert calculate_lcom4("Account", analyzer.classes) == 2, "rename is its own component"
+    assert analyzer.classes["Account"]["method_calls"]["withdraw"] == ["log"], "Self calls tracked"
+    
+    analyzer = analyze_source("class Split:\n    def a(self):\n        self.x = 1\n"
+                              "    def b(self):\n        self.y = 1\n"
+                              "    def c(self):\n        self.z = 1\n")
+    assert calculate_lcom("Split", analyzer.classes) == 3, "No pair shares an attribute"
+    assert calculate_lcom4("Split", analyzer.classes) == 3, "Every method is isolated"
+
+
+def test_inheritance_graph_across_modules():
+    """Imported, dotted and re-exported bases resolve; cycles terminate"""
+    files = {
+        "app/__init__.py": "from .people import Person\n",
+        "app/people.py": "class Person:\n    pass\n",
+        "app/staff.py": "from . import people\nclass Lecturer(people.Person):\n    pass\n",
+        "school.py": "from app import Person\nimport app.staff as staff\n"
+                     "class Student(Person):\n    pass\n"
+                     "class Professor(staff.Lecturer):\n    pass\n"
+                     "class Loop(Cycle):\n    pass\nclass Cycle(Loop):\n    pass\n",
+    }
+    with tempfile.TemporaryDirectory() as root:
+        for name, source in files.items():
+            os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+            with open(os.path.join(root, name), "w") as f:
+                f.write(source)
+        merged = analyze_directory(root, workers=1)
+    
+    assert merged["dit"]["school.Student"] == 1, "Re-exported base resolved"
+    assert merged["dit"]["school.Professor"] == 2, "Attribute base resolved across modules"
+    assert merged["noc"]["app.people.Person"] == 2, "Children counted across modules"
+    assert merged["dit"]["school.Loop"] is None, "Cycle members have no depth"
+    assert merged["cycles"] == [["school.Loop", "school.Cycle"]], "Cycle reported"
+    
+    dit, noc, _ = compute_hierarchy({"Base": ["object"], "Child": ["Base"]})
+    assert dit == {"Base": 1, "Child": 2} and noc["Base"] == 1, "External bases add one level"
+
+
+def test_streaming_records():
+    """One JSONL/CSV record per method, then per class once the project is known"""
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "car.py")
+        with open(path, "w") as f:
+            f.write(SAMPLE_SOURCE)
+        
+        output = io.StringIO()
+        errors = stream_path(path, MetricWriter(output, "jsonl"))
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        
+        output = io.StringIO()
+        stream_path(root, MetricWriter(output, "csv"), workers=1)
+        rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+    
+    assert errors == {}, "No errors for a valid file"
+    assert [r["kind"] for r in records] == ["method"] * 3 + ["class"] * 3, "Methods first"
+    assert {"kind": "class", "file": path, "name": "Car", "cbo": 2, "dit": 0, "noc": 0,
+            "lcom1": 0, "lcom4": 1} in records, "Class record carries class metrics"
+    assert rows[0]["name"] == "car.Engine.start" and rows[0]["cc"] == "1", "CSV qualified by module"
+
+
+def test_history_only_analyzes_changed_blobs():
+    """Each revision re-analyzes only the files whose blob changed"""
+    with tempfile.TemporaryDirectory() as root:
+        subprocess.run(["git", "init", "-q", root], check=True)
+        commit(root, {"car.py": SAMPLE_SOURCE, "empty.py": ""}, "first")
+        commit(root, {"car.py": SAMPLE_SOURCE + "\nclass Truck(Car):\n    pass\n"}, "second")
+        commit(root, {"notes.txt": "not python"}, "third")
+        points = list(iter_history(root, per_class=True))
+    
+    assert [p["analyzed"] for p in points] == [2, 1, 0], "Unchanged blobs are reused"
+    assert [p["classes"] for p in points] == [3, 4, 4], "Class counts tracked per revision"
+    assert points[0]["cc_total"] == 4 and points[0]["methods"] == 3, "Aggregate CC"
+    assert points[2]["per_class"]["car.Car"]["cbo"] == 2, "Per-class CBO"
+
+
+def test_history_updates_coupling_incrementally():
+    """CBO follows classes appearing elsewhere; evicted blobs are analyzed again"""
+    with tempfile.TemporaryDirectory() as root:
+        subprocess.run(["git", "init", "-q", root], check=True)
+        commit(root, {"a.py": "class A:\n    def f(self):\n        return B()\n", "b.py": ""}, "1")
+        commit(root, {"b.py": "class B:\n    pass\n"}, "2")
+        commit(root, {"b.py": ""}, "3")
+        os.remove(os.path.join(root, "a.py"))
+        commit(root, {}, "4")
+        points = list(iter_history(root, per_class=True))
+        uncached = list(iter_history(root, blob_cache=1))
+    
+    assert [p["per_class"].get("a.A", {}).get("cbo") for p in points] == [0, 1, 0, None], "CBO"
+    assert [p["cbo_max"] for p in points] == [0, 1, 0, 0], "Unchanged files are re-coupled"
+    assert [p["classes"] for p in points] == [1, 2, 1, 0], "Deleted files drop their classes"
+    assert [p["analyzed"] for p in points] == [2, 1, 0, 0], "Reverted blob reused"
+    assert [p["analyzed"] for p in uncached] == [2, 1, 1, 0], "Evicted blob analyzed again"
+    assert points[1]["per_class"]["a.A"] == {"cc": 1, "loc": 4, "cbo": 1}, "Per-class totals"
+
+
+def test_watcher_reuses_unchanged_methods():
+    """Editing one method re-measures only that method"""
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "car.py")
+        with open(path, "w") as f:
+            f.write(SAMPLE_SOURCE)
+        watcher = MetricWatcher(root)
+        assert watcher.scan() == 1, "Initial scan analyzes the file"
+        assert watcher.scan() == 0, "Unchanged files are not re-analyzed"
+        
+        with open(path, "w") as f:
+            f.write(SAMPLE_SOURCE.replace("Engine.start(self.engine)",
+                                          "if self.engine:\n            Engine.start(self.engine)"))
+        report = watcher.query("file car.py")
+    
+    assert watcher.reused == 2, "Engine.start and Car.__init__ reused"
+    assert report["methods"]["Car.drive"]["cc"] == 2, "Edited method re-measured"
+    assert report["classes"]["Car"]["cbo"] == 2, "Class metrics answered"
+    assert "error" in watcher.query("missing"), "Unknown queries are reported"
+
+
+def test_synthetic_corpus_shape():
+    """The benchmark corpus is reproducible and has the requested shape"""
+    source = generate_corpus(classes=6, methods=3, inheritance_depth=3, seed=1)
+    assert source == generate_corpus(classes=6, methods=3, inheritance_depth=3, seed=1), "Seeded"
+    
+    analyzer = analyze_source(source)
+    dit, _, _ = compute_hierarchy({name: info["bases"] for name, info in analyzer.classes.items()})
+    assert len(analyzer.classes) == 6 and len(analyzer.complexity) == 18, "Class/method counts"
+    assert max(dit.values()) == 2, "Chains of three classes"
+
+
+def test_token_line_counts_and_spans():
+    """Line counts and def/class spans come from the token stream alone"""
+    source = b'''# Header comment
+
+class Shape:
+    """Docstring"""
+
+    @property
+    def area(self):  # trailing comment
+        return (1 +
+                2)
+
+    async def load(self): return None
+
+    def nested(self):
+        def inner():
+            pass
+        return inner
+x = 1
+'''
+    result = count_lines(source)
+    spans = result["spans"]
+    
+    assert (result["loc"], result["sloc"], result["comments"], result["blank"]) == (17, 12, 2, 4)
+    assert result["lloc"] == 11, "Continuation lines are one logical line"
+    assert (spans["Shape"]["start"], spans["Shape"]["end"]) == (3, 16), "Class span"
+    assert (spans["Shape.area"]["start"], spans["Shape.area"]["end"]) == (7, 9), "Method span"
+    assert spans["Shape.load"]["loc"] == 1, "One-line async def"
+    assert spans["Shape.nested.inner"]["kind"] == "def", "Nested defs qualified"
+
+
+def test_gate_thresholds_and_fail_fast():
+    """Only values above their limit fail; fail-fast stops at the first one"""
+    branchy = "class Router:\n    def route(self, a, b, c):\n        if a and b and c:\n            return 1\n"
+    with tempfile.TemporaryDirectory() as root:
+        for name in ("a.py", "b.py"):
+            with open(os.path.join(root, name), "w") as f:
+                f.write(branchy)
+        with open(os.path.join(root, "car.py"), "w") as f:
+            f.write(SAMPLE_SOURCE)
+        
+        thresholds = parse_thresholds("cc=3,cbo=1")
+        violations = run_gate(root, thresholds, workers=1)
+        first = run_gate(root, thresholds, fail_fast=True, workers=1)
+        passing = run_gate(root, parse_thresholds("cc=4,dit=0,lcom4=1"), workers=1)
+        profiler = Profiler()
+        run_gate(root, parse_thresholds("cc=3"), fail_fast=True, workers=1, profiler=profiler)
+        for i in range(12):
+            with open(os.path.join(root, f"z{i:02d}.py"), "w") as f:
+                f.write(branchy)
+        parallel = run_gate(root, parse_thresholds("cc=3"), fail_fast=True, workers=2)
+    with tempfile.TemporaryDirectory() as root:
+        with open(os.path.join(root, "many.py"), "w") as f:
+            f.write(branchy + "    def again(self, a, b, c):\n        return a and b and c\n")
+        within_file = run_gate(root, parse_thresholds("cc=1,lcom1=0"), fail_fast=True, workers=1)
+    
+    assert thresholds == {"cc": 3, "cbo": 1}, "Spec parsed"
+    assert [(v["metric"], v["name"]) for v in violations] == [
+        ("cc", "a.Router.route"), ("cc", "b.Router.route"), ("cbo", "car.Car")], "All violations"
+    assert len(first) == 1 and first[0]["value"] == 4, "Fail-fast stops at the first"
+    assert passing == [], "Values at the limit pass"
+    assert profiler.files == 1, "Fail-fast stops analyzing after the violating file"
+    assert len(parallel) == 1, "Fail-fast stops the worker pool"
+    assert len(within_file) == 1, "Fail-fast stops within a file"
+
+
+def test_complexity_gate_skips_other_metrics():
+    """CC/LOC/DIT/NOC gates use the lighter visitor and leave the cache untouched"""
+    full, lite = MetricAnalyzer(), ComplexityAnalyzer()
+    for analyzer in (full, lite):
+        analyzer.visit(ast.parse(SAMPLE_SOURCE))
+    with tempfile.TemporaryDirectory() as root:
+        with open(os.path.join(root, "car.py"), "w") as f:
+            f.write(SAMPLE_SOURCE)
+        with open(os.path.join(root, "sedan.py"), "w") as f:
+            f.write("from car import Car\n\nclass Sedan(Car):\n    pass\n")
+        cache = ResultCache(os.path.join(root, ".cache"), ANALYZER_VERSION)
+        violations = run_gate(root, parse_thresholds("cc=1,dit=0"), workers=1, cache=cache)
+        cached = [name for _, _, names in os.walk(cache.directory) for name in names]
+    
+    assert (lite.complexity, lite.loc) == (full.complexity, full.loc), "Same CC and LOC"
+    assert lite.halstead == {} and not any(info["references"] for info in lite.classes.values())
+    assert [(v["metric"], v["name"]) for v in violations] == [
+        ("cc", "car.Car.__init__"), ("dit", "sedan.Sedan")], "Bases still resolved for DIT"
+    assert cached == ["index.json"], "Partial results not cached"
+
+
+def test_columnar_store_aggregates():
+    """Columnar aggregates agree with plain Python, and snapshots round-trip"""
+    store = MetricStore()
+    for i in range(1, 101):
+        store.write_method("models.py", f"Model.method_{i}", i, i * 2)
+    store.write_class("models.py", "Model", 3, None, 0, 5, 2)
+    
+    stats = store.summary("method", "cc")
+    assert stats["count"] == 100 and stats["max"] == 100, "Summary counts"
+    assert abs(stats["p90"] - 90.1) < 1e-9, "Percentiles interpolate like numpy"
+    assert store.top_k("method", "loc", 2) == [("Model.method_100", "models.py", 200),
+                                               ("Model.method_99", "models.py", 198)], "Top-K"
+    counts, edges = store.histogram("method", "cc", bins=4)
+    assert counts == [25, 25, 25, 25] and edges[0] == 1, "Equal-width bins"
+    assert store.summary("class", "dit") == {"count": 0}, "Undefined DIT left out"
+    assert store.percentile("class", "dit", 50) is None, "No percentile of an empty column"
+    
+    store.write_method("views.py", "View.get", 1, 2, 10.5, 71.25)
+    assert store.percentile("method", "mi", 100) == 71.25, "MI keeps its fractional part"
+    
+    other = MetricStore()
+    other.write_method("views.py", "Other.post", 200, 1, 3.0, 50.5)
+    merged = MetricStore.merge([store, other])
+    assert len(merged) == len(store) + len(other), "Stores merge across repositories"
+    assert merged.top_k("method", "cc", 2) == [("Other.post", "views.py", 200),
+                                               ("Model.method_100", "models.py", 100)], "Names kept"
+    assert merged.top_k("method", "mi", 1) == [("View.get", "views.py", 71.25)], "Floats merged"
+    
+    if np is not None:
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "snapshot.npz")
+            store.save(path)
+            loaded = MetricStore.load(path)
+        assert loaded.top_k("method", "cc", 1) == [("Model.method_100", "models.py", 100)]
+    else:
+        with tempfile.TemporaryDirectory() as root, contextlib.redirect_stderr(io.StringIO()):
+            try:
+                main([root, "--format", "npz", "--output", os.path.join(root, "snapshot.npz")])
+            except SystemExit as e:
+                assert e.code == 2, "Usage error before analyzing"
+            else:
+                raise AssertionError("npz without NumPy must fail")
+
+
+def test_profiler_phases_and_file_hooks():
+    """Profiling times every phase and reports per-file parse cost to hooks"""
+    seen = []
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "sample.py")
+        with open(path, "w") as f:
+            f.write(SAMPLE_SOURCE)
+        profiler = Profiler(on_file=seen.append)
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyze_file(path, profiler)
+        
+        assert set(profiler.phases) == {"read", "parse", "visit", "hierarchy",
+                                        "class_metrics", "report"}, "Phases"
+        assert seen[0]["nodes"] == sum(1 for _ in ast.walk(ast.parse(SAMPLE_SOURCE))), "Nodes"
+        
+        profiler = Profiler()
+        analyze_directory(root, workers=1, profiler=profiler)
+        report = profiler.report()
+    assert report["files"] == 1 and report["slowest_files"][0]["path"] == path, "Directory"
+    assert report["file_totals"]["parse"] > 0, "Worker timings reach the parent"
+
+
+def test_bounded_memory_streaming_spills():
+    """Class records spilled past the memory limit come back unchanged and in order"""
+    corpus = {"models.py": generate_corpus(classes=30, methods=3, seed=4), "car.py": SAMPLE_SOURCE}
+    with tempfile.TemporaryDirectory() as root:
+        for name, source in corpus.items():
+            with open(os.path.join(root, name), "w") as f:
+                f.write(source)
+        outputs = []
+        for limit in (None, 1):
+            output = io.StringIO()
+            stream_path(root, MetricWriter(output, "jsonl"), workers=1, memory_limit=limit)
+            outputs.append(output.getvalue())
+    assert outputs[0] == outputs[1], "Spilling doesn't change the records"
+    
+    strings = StringTable()
+    spool = RecordSpool(max_bytes=1)
+    for i in range(5):
+        spool.append(ClassRecord.from_summary(strings, "a.py", f"a.C{i}", f"C{i}",
+                                              {"references": ["C0", "C1", "int"]}, i, 1))
+    assert spool.spilled == 5 and [r.lcom1 for r in spool] == [0, 1, 2, 3, 4], "Spilled in order"
+    class_ids = {strings.lookup(f"C{i}") for i in range(5)}
+    assert [r.cbo(class_ids) for r in spool][:3] == [1, 1, 2], "CBO from interned references"
+    spool.close()
+
+
+def test_halstead_and_maintainability_index():
+    """Operator/operand counts and MI come from the same pass as CC and LOC"""
+    source = '''
+class Ratio:
+    def scale(self, a, b):
+        if a > b and not a:
+            return a + b * 2
+        return -b
+'''
+    analyzer = analyze_source(source)
+    
+    # Operators: > and not + * unary-; operands: a, b, the compare, `not a`, `b * 2`, 2
+    assert analyzer.halstead["Ratio.scale"] == [6, 6, 6, 10], "Halstead counts"
+    volume = halstead_volume(6, 6, 6, 10)
+    assert abs(volume - 16 * math.log2(12)) < 1e-9, "Volume is length times log2 vocabulary"
+    expected = (171 - 5.2 * math.log(volume) - 0.23 * 3 - 16.2 * math.log(4)) * 100 / 171
+    assert analyzer.mi["Ratio.scale"] == round(expected, 2), "MI over the method's lines"
+    assert maintainability_index(0.0, 1, 1) == 100.0, "Trivial methods are fully maintainable"
+    
+    documented = analyze_source(source.replace("b):\n", 'b):\n        """Scale a by b\n\n        Twice."""\n\n        # Guard\n'))
+    assert documented.mi["Ratio.scale"] == analyzer.mi["Ratio.scale"], "Only code lines count"
+    repeated = analyze_source("class R:\n    def f(self):\n        return self.x + self.x + g() * g()\n")
+    # self.x once; each call and each BinOp operand of the outer + is its own operand
+    assert repeated.halstead["R.f"][1] == 5, "Repeated self.x counted once"
+
+
+def test_diff_scoped_metrics():
+    """Only methods a patch touches are measured, with before/after deltas"""
+    with tempfile.TemporaryDirectory() as root:
+        subprocess.run(["git", "init", "-q", root], check=True)
+        commit(root, {"car.py": SAMPLE_SOURCE}, "first")
+        with open(os.path.join(root, "car.py"), "w") as f:
+            f.write(SAMPLE_SOURCE.replace("        self.engine.start()",
+                                          "        if self.engine:\n"
+                                          "            self.engine.start()"))
+        diff = subprocess.run(["git", "-C", root, "diff"], check=True, stdout=subprocess.PIPE,
+                              universal_newlines=True).stdout
+        records = {r["name"]: r for r in analyze_diff(diff.splitlines(), root)}
+        
+        # A diff between two commits reads both sides from git, whatever the working tree holds
+        subprocess.run(["git", "-C", root, "-c", "user.name=test", "-c", "user.email=test@uni.com",
+                        "commit", "-qam", "second"], check=True)
+        with open(os.path.join(root, "car.py"), "w") as f:
+            f.write("class Later:\n    def f(self):\n        return 1\n\n\n" + SAMPLE_SOURCE)
+        diff = subprocess.run(["git", "-C", root, "diff", "HEAD~1", "HEAD"], check=True,
+                              stdout=subprocess.PIPE, universal_newlines=True).stdout
+        committed = {r["name"]: r for r in analyze_diff(diff.splitlines(), root)}
+    
+    assert set(records) == {"Car", "Car.drive"}, "Untouched methods and classes are skipped"
+    drive = records["Car.drive"]
+    assert drive["kind"] == "method" and drive["delta"]["cc"] == 1, "Added branch shows in CC"
+    assert drive["before"]["cc"] == 1 and drive["after"]["cc"] == 2, "Pre-image from git"
+    assert records["Car"]["delta"] == {"cbo": 0, "lcom1": 0, "lcom4": 0}, "Class deltas"
+    
+    assert committed == records, "Post-image from the new blob, not the working tree"
+    
+    changes = parse_unified_diff(diff.splitlines())
+    assert changes[0]["old_path"] == changes[0]["new_path"] == "car.py", "Paths lose a/ b/"
+
+
+if __name__ == "__main__":
+    test_cbo_counts_distinct_classes()
+    test_single_pass_method_metrics()
+    test_directory_analysis_merges_files()
+    test_cache_skips_unchanged_files()
+    test_lcom_from_method_attribute_masks()
+    test_inheritance_graph_across_modules()
+    test_streaming_records()
+    test_history_only_analyzes_changed_blobs()
+    test_history_updates_coupling_incrementally()
+    test_watcher_reuses_unchanged_methods()
+    test_synthetic_corpus_shape()
+    test_token_line_counts_and_spans()
+    test_gate_thresholds_and_fail_fast()
+    test_complexity_gate_skips_other_metrics()
+    test_columnar_store_aggregates()
+    test_profiler_phases_and_file_hooks()
+    test_bounded_memory_streaming_spills()
+    test_halstead_and_maintainability_index()
+    test_diff_scoped_metrics()
+    print("✅ All tests passed!")
@@ -1,9 +1,21 @@
 """
 Test script to verify refactored code works correctly
 """
+import contextlib
+import csv
+import datetime
+import gc
+import io
+import json
+import os
+import tempfile
+
 from University_Course_Registration_System_Refactored import (
-    Student, Course, Lecturer, Registrar
+    AttendanceCalculator, AttendanceRecord, AuditLogSink, BulkImporter, EventSink, RingBufferSink,
+    emit_event, set_event_sink, CohortScores, GradeCalculator, PerformanceEvaluator,
+    PerformanceLevel, ReportGenerator, ReportSink, Student, Course, Lecturer, Registrar
 )
+from registration_storage import SQLiteStorage
 
 def test_basic_functionality():
     """Test that refactored code maintains original functionality"""
@@ -43,6 +55,367 @@ def test_basic_functionality():
     
     print("✅ All tests passed!")
 
+def test_indexed_lookups():
+    """Registrar, Student and Course look records up by id/code and return views"""
+    registrar = Registrar()
+    course = Course("CS101", "Intro to Programming", 3)
+    students = [Student(f"S{i:03d}", f"Student {i}", f"s{i}@uni.com") for i in range(3)]
+    registrar.add_course(course)
+    for student in students:
+        assert registrar.add_student(student), "New ids are added"
+        course.enroll_student(student)
+    
+    assert not registrar.add_student(Student("S001", "Dup", "dup@uni.com")), "Ids are unique"
+    assert registrar.find_student("S001") is students[1], "Lookup by student id"
+    assert registrar.find_course("CS101") is course, "Lookup by course code"
+    assert registrar.find_student("S999") is None, "Missing ids return None"
+    assert course.has_student("S002") and not course.has_student("S999"), "Enrollment index"
+    
+    view = registrar.get_students()
+    registrar.add_student(Student("S100", "Late", "late@uni.com"))
+    assert len(view) == 4, "Views stay current instead of being copied"
+    try:
+        students[0].grades["CS101"] = "A"
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("Grades view should be read-only")
+    print("✅ Indexed lookups passed!")
+
+def test_bulk_import():
+    """CSV/JSONL rows are validated, deduplicated and reported per line"""
+    with tempfile.TemporaryDirectory() as root:
+        students = os.path.join(root, "students.csv")
+        with open(students, "w") as f:
+            f.write("student_id,name,email\nS001,Alice,alice@uni.com\nS002,Bob,\n"
+                    "S001,Alice Again,a2@uni.com\nS003, Carol ,carol@uni.com\n")
+        courses = os.path.join(root, "courses.jsonl")
+        with open(courses, "w") as f:
+            f.write(json.dumps({"code": "CS101", "title": "Intro", "credit_hours": 3}) + "\n")
+            f.write(json.dumps({"code": "CS201", "title": "DS", "credit_hours": "x"}) + "\n")
+            f.write("not json\n")
+        enrollments = os.path.join(root, "enrollments.csv")
+        with open(enrollments, "w") as f:
+            f.write("student_id,course_code\nS001,CS101\nS003,CS101\nS001,CS101\n"
+                    "S002,CS101\nS001,CS999\n")
+        
+        registrar = Registrar()
+        gc_states, add_students = [], registrar.add_students
+        registrar.add_students = lambda batch: gc_states.append(gc.isenabled()) or add_students(batch)
+        importer = BulkImporter(registrar, batch_size=2)
+        student_report = importer.import_students(students)
+        course_report = importer.import_courses(courses)
+        enrollment_report = importer.import_enrollments(enrollments)
+    
+    assert (student_report.rows, student_report.added) == (4, 2), "Students imported"
+    assert student_report.errors == [(3, "Missing email"), (4, "Duplicate student S001")], "Errors"
+    assert registrar.find_student("S003").name == "Carol", "Values are stripped"
+    assert course_report.added == 1 and course_report.error_count == 2, "Bad courses skipped"
+    assert [line for line, _ in course_report.errors] == [2, 3], "JSONL errors by line"
+    course = registrar.find_course("CS101")
+    assert enrollment_report.added == 2 and course.get_student_count() == 2, "Enrolled once each"
+    assert [message for _, message in enrollment_report.errors] == [
+        "Duplicate enrollment S001 in CS101", "Unknown student S002", "Unknown course CS999"
+    ], "Enrollment errors"
+    assert registrar.find_student("S001").is_registered_for("CS101"), "Both sides linked"
+    assert gc_states and all(gc_states), "GC stays on unless the caller pauses it"
+    
+    registrar = Registrar()
+    add_students = registrar.add_students
+    registrar.add_students = lambda batch: gc_states.append(gc.isenabled()) or add_students(batch)
+    with tempfile.TemporaryDirectory() as root:
+        students = os.path.join(root, "students.csv")
+        with open(students, "w") as f:
+            f.write("student_id,name,email\nS001,Alice,alice@uni.com\n")
+        BulkImporter(registrar, pause_gc=True).import_students(students)
+    assert gc_states[-1] is False and gc.isenabled(), "Opt-in pause is restored afterwards"
+    print("✅ Bulk import passed!")
+
+def test_sqlite_storage():
+    """Records persist in SQLite, load lazily and roll back with a failed transaction"""
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "registry.db")
+        storage = SQLiteStorage(path, batch_size=2)
+        registrar = Registrar(storage)
+        lecturer = Lecturer("L001", "Dr. Smith", "smith@uni.com", "CS")
+        course = Course("CS101", "Intro to Programming", 3)
+        student = Student("S001", "Alice", "alice@uni.com", "555-0100")
+        registrar.add_lecturer(lecturer)
+        registrar.add_course(course)
+        registrar.add_student(student)
+        lecturer.assign_course(course)
+        course.enroll_student(student)
+        student.add_attendance("CS101", [True, False])
+        student.add_session("CS101", True)
+        with registrar.transaction():
+            lecturer.submit_grades([student], "CS101", "A")
+        try:
+            with registrar.transaction():
+                registrar.add_student(Student("S002", "Bob", "bob@uni.com"))
+                raise RuntimeError("abort")
+        except RuntimeError:
+            pass
+        assert registrar.find_student("S002") is None, "Rolled back"
+        storage.close()
+        
+        storage = SQLiteStorage(path)
+        registrar = Registrar(storage)
+        assert len(registrar.get_students()) == 1, "One student stored"
+        student = registrar.find_student("S001")
+        assert student is registrar.find_student("S001"), "One object per record"
+        assert student.phone == "555-0100" and student.grades["CS101"] == "A", "Fields reloaded"
+        assert list(student.attendance["CS101"]) == [True, False, True], "Attendance reloaded"
+        course = registrar.find_course("CS101")
+        assert student.is_registered_for("CS101") and course.has_student("S001"), "Enrollment"
+        assert course.lecturer.name == "Dr. Smith", "Lecturer linked"
+        assert [c.code for c in registrar.find_lecturer("L001").courses] == ["CS101"], "Teaching"
+        storage.close()
+    print("✅ SQLite storage passed!")
+
+def test_sqlite_assign_before_add_course():
+    """A course assigned before it is added is still added, with its lecturer"""
+    storage = SQLiteStorage(":memory:")
+    registrar = Registrar(storage)
+    lecturer = Lecturer("L001", "Dr. Smith", "smith@uni.com", "CS")
+    course = Course("CS101", "Intro to Programming", 3)
+    registrar.add_lecturer(lecturer)
+    lecturer.assign_course(course)
+    assert registrar.find_course("CS101") is None, "Not added by the assignment"
+    assert registrar.add_course(course), "Added afterwards"
+    assert registrar.find_course("CS101") is course, "Same object"
+    storage.flush()
+    assert storage.fetch_one("SELECT lecturer_id FROM courses") == ("L001",), "Lecturer saved"
+    storage.close()
+
+def test_sqlite_counts_buffered_rows():
+    """len() of a stored index includes rows still in the write buffer"""
+    storage = SQLiteStorage(":memory:")
+    registrar = Registrar(storage)
+    for i in range(5):
+        registrar.add_student(Student(f"S{i:03d}", f"Student {i}", "s@uni.com"))
+    assert len(registrar.get_students()) == 5, "Counted before any flush"
+    storage.close()
+
+def test_cohort_scores():
+    """Batch scores match the per-student calculators"""
+    students = [Student(f"S{i:03d}", f"Student {i}", f"s{i}@uni.com") for i in range(45)]
+    for i, student in enumerate(students):
+        for c in range(i % 5):
+            student.add_grade(f"C{c}", "ABCDEb"[(i + c) % 6])
+        for c in range(i % 4):
+            student.add_attendance(f"C{c}", [(i + c + k) % 3 != 0 for k in range((i + c) % 7)])
+    # GPA 1/40 is a rounding tie that np.round and round() settle differently
+    for c in range(40):
+        students[40].add_grade(f"C{c}", "D" if c == 0 else "E")
+    
+    scores = list(CohortScores.from_students(students).scores())
+    assert len(scores) == len(students), "One score per student"
+    for student, (gpa, attendance, level) in zip(students, scores):
+        expected_gpa = GradeCalculator.calculate_gpa(student.grades)
+        expected_attendance = AttendanceCalculator.calculate_average_attendance(student.attendance)
+        assert (gpa, attendance) == (expected_gpa, expected_attendance), student.person_id
+        assert level == PerformanceEvaluator.evaluate_performance(gpa, attendance), "Level"
+    assert scores[0] == (0.0, 0.0, PerformanceLevel.WARNING), "No records score zero"
+    rows = CohortScores(2, [0, 0, 1], [4, 3, 2], [0, 1, 1], [1, 3, 0], [2, 3, 0]).scores()
+    assert list(rows) == [(3.5, 50.0, PerformanceLevel.WARNING),
+                          (2.0, 50.0, PerformanceLevel.WARNING)], "Columns given as rows"
+    print("✅ Cohort scores passed!")
+
+def test_attendance_record():
+    """Attendance is packed one bit per session and counted by range"""
+    flags = [i % 3 != 0 for i in range(21)]
+    record = AttendanceRecord(flags)
+    assert len(record) == 21 and list(record) == flags, "Round trip"
+    assert len(record.to_bytes()) == 3, "Eight sessions per byte"
+    assert record[0] is False and record[-1] is True, "Indexing"
+    for start, stop in [(0, None), (0, 8), (3, 17), (8, 16), (5, 5), (-4, None), (20, 40)]:
+        assert record.attended(start, stop) == sum(flags[start:stop]), (start, stop)
+    assert record.rate(0, 3) == (2 / 3) * 100 and AttendanceRecord().rate() == 0.0, "Rates"
+    
+    student = Student("S001", "Alice", "alice@uni.com")
+    for flag in flags:
+        student.add_session("CS101", flag)
+    assert student.attendance["CS101"] == record, "Sessions appended one at a time"
+    assert AttendanceRecord.from_bytes(record.to_bytes(), 21) == record, "Bytes round trip"
+    student.add_attendance("CS201", [])
+    expected = ((14 / 21) * 100 + 0.0) / 2
+    assert AttendanceCalculator.calculate_average_attendance(student.attendance) == expected
+    plain = {"CS101": flags, "CS201": []}
+    assert AttendanceCalculator.calculate_average_attendance(plain) == expected, "Plain lists"
+    mixed = {"CS101": record, "CS201": []}
+    assert AttendanceCalculator.calculate_average_attendance(mixed) == expected, "Mixed input"
+    print("✅ Attendance records passed!")
+
+def test_incremental_aggregates():
+    """Running GPA/attendance totals track every update and match a full recompute"""
+    student = Student("S001", "Alice", "alice@uni.com")
+    lecturer = Lecturer("L001", "Dr. Smith", "smith@uni.com", "CS")
+    assert (student.gpa(), student.average_attendance()) == (0.0, 0.0), "Empty"
+    for step in range(200):
+        code = f"C{step % 7}"
+        if step % 5 == 0:
+            lecturer.submit_grades([student], code, "ABCDEx"[step % 6])
+        elif step % 5 == 1:
+            student.add_grade(code, "ab"[step % 2])  # Regrades replace the old points
+        elif step % 5 == 2:
+            student.add_attendance(code, [(step + k) % 4 != 0 for k in range(step % 9)])
+        else:
+            student.add_session(code, step % 3 != 0)
+        assert student.verify_aggregates(), f"Totals diverged at step {step}"
+    assert student.calculate_performance() == student.gpa(), "Performance uses the totals"
+    
+    records = AttendanceRecord([True, False])
+    student.add_attendance("C8", records)
+    records.append(False)
+    assert not hasattr(student.attendance["C8"], "append"), "Exposed records are read-only"
+    assert student.attendance["C8"] == AttendanceRecord([True, False]), "Added records copied"
+    assert student.verify_aggregates(), "Outside changes can't bypass the totals"
+    
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "registry.db")
+        storage = SQLiteStorage(path)
+        Registrar(storage).add_student(student)
+        storage.close()
+        storage = SQLiteStorage(path)
+        stored = Registrar(storage).find_student("S001")
+        assert (stored.gpa(), stored.average_attendance()) == (
+            student.gpa(), student.average_attendance()), "Totals rebuilt from storage"
+        stored.add_grade("C9", "A")
+        stored.add_session("C9", True)
+        assert stored.verify_aggregates(), "Stored students keep their totals"
+        storage.close()
+    print("✅ Incremental aggregates passed!")
+
+def test_report_sinks():
+    """Report rows stream to text, CSV and JSONL sinks, by section and page"""
+    registrar = Registrar()
+    lecturer = Lecturer("L001", "Dr. Smith", "smith@uni.com", "CS")
+    registrar.add_lecturer(lecturer)
+    course = Course("CS101", "Intro to Programming", 3)
+    registrar.add_course(course)
+    lecturer.assign_course(course)
+    for i in range(5):
+        student = Student(f"S{i:03d}", f"Student {i}", f"s{i}@uni.com")
+        registrar.add_student(student)
+        course.enroll_student(student)
+        student.add_grade("CS101", "ABCDE"[i])
+        student.add_attendance("CS101", [True] * (5 - i) + [False] * i)
+    
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        registrar.full_report()
+    lines = output.getvalue().splitlines()
+    assert lines[:3] == ["=== Full University Report ===",
+                         "CS101: Intro to Programming, Credits: 3, Lecturer: Dr. Smith",
+                         "Enrolled students:"], "Text report header"
+    assert lines[-2:] == ["GPA: 0.0, Attendance: 20.0%", "Warning: Poor performance"], "Tail"
+    
+    generator = ReportGenerator(page_size=2)
+    page = list(generator.rows(registrar, sections=["students"], pages=range(1, 2)))
+    assert [row["student_id"] for row in page] == ["S002", "S003"], "Second page only"
+    assert page[0]["gpa"] == 2.0 and page[0]["performance"] == "NORMAL", "Structured rows"
+    
+    stream = io.StringIO()
+    sink = ReportGenerator.SINKS["csv"](stream, buffer_size=64)
+    count = generator.write(registrar, sink, sections=["lecturers", "courses"])
+    rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+    assert count == len(rows) == 8, "Every row written through a small buffer"
+    assert [row["kind"] for row in rows[:3]] == ["lecturer", "teaching", "course"], "Order"
+    assert rows[1]["students"] == "5", "Enrolled count"
+    
+    stream = io.StringIO()
+    generator.write(registrar, ReportGenerator.SINKS["jsonl"](stream), pages=range(2, 3))
+    rows = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [row["kind"] for row in rows] == ["student"], "Only the third page has rows"
+    assert sink.render(rows[0]) == "student,,,,,,S004,Student 4,,,0.0,20.0,WARNING\n", "CSV render"
+    
+    class Unfinished(ReportSink):
+        pass
+    try:
+        Unfinished(io.StringIO())
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("Sinks without render() can't be created")
+    print("✅ Report sinks passed!")
+
+def test_mutation_events():
+    """Mutations are silent by default and send structured events to the configured sink"""
+    registrar = Registrar()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        registrar.add_student(Student("S000", "Quiet", "q@uni.com"))
+    assert output.getvalue() == "", "No output without a sink"
+    
+    ring = RingBufferSink(capacity=4)
+    previous = set_event_sink(ring)
+    try:
+        student = Student("S001", "Alice", "alice@uni.com")
+        course = Course("CS101", "Intro to Programming", 3)
+        lecturer = Lecturer("L001", "Dr. Smith", "smith@uni.com", "CS")
+        registrar.add_student(student)
+        registrar.add_student(student)
+        course.enroll_student(student)
+        lecturer.assign_course(course)
+        lecturer.submit_grades([student], "CS101", "A")
+        events = ring.events()
+        assert [event["event"] for event in events] == [
+            "course_registered", "student_enrolled", "lecturer_assigned", "grade_submitted"
+        ], "Only the newest events are kept"
+        assert events[-1]["grade"] == "A" and events[-1]["staff_id"] == "L001", "Event fields"
+        
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "audit.jsonl")
+            audit = AuditLogSink(path, batch_size=3)
+            set_event_sink(audit)
+            registrar.add_students(Student(f"S{i:03d}", f"Student {i}", "s@uni.com")
+                                   for i in range(2, 12))
+            audit.flush()
+            with open(path) as f:
+                assert len(f.readlines()) == 10, "Flushed events are on disk"
+            course.enroll_students([registrar.find_student("S002")])
+            audit.close()
+            with open(path) as f:
+                events = [json.loads(line) for line in f]
+            assert len(events) == 11 and events[-1]["event"] == "student_enrolled", "Closed"
+            assert audit.error is None, "No write errors"
+            
+            audit = AuditLogSink(path)
+            set_event_sink(audit)
+            emit_event("custom", when=datetime.date(2024, 1, 2))
+            loop = {}
+            loop["self"] = loop
+            emit_event("custom", loop=loop)
+            emit_event("custom", n=1)
+            audit.flush()
+            audit.close()
+            audit.flush()  # Returns once the thread has stopped
+            with open(path) as f:
+                events = [json.loads(line) for line in f][11:]
+            assert [e.get("when", e.get("n")) for e in events] == ["2024-01-02", 1], "Bad event dropped"
+            assert isinstance(audit.error, ValueError), "Encoding error kept"
+        
+        class Unfinished(EventSink):
+            pass
+        try:
+            Unfinished()
+        except TypeError:
+            pass
+        else:
+            raise AssertionError("Sinks without emit() can't be created")
+    finally:
+        set_event_sink(previous)
+    print("✅ Mutation events passed!")
+
 if __name__ == "__main__":
     test_basic_functionality()
-
+    test_indexed_lookups()
+    test_bulk_import()
+    test_sqlite_storage()
+    test_sqlite_assign_before_add_course()
+    test_sqlite_counts_buffered_rows()
+    test_cohort_scores()
+    test_attendance_record()
+    test_incremental_aggregates()
+    test_report_sinks()
+    test_mutation_events()